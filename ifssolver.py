@@ -7,7 +7,6 @@ import logging
 import sys
 from pathlib import Path
 
-from solver import Solver
 from solver.config import ConfigProxy
 
 logger = logging.getLogger('ifssolver')
@@ -29,9 +28,18 @@ def main():
 
     parser.add_argument('--metadata', dest='metadata', action='store', help='use specified METADATA')
     parser.add_argument('--method', dest='method', metavar='opencv', default='opencv',
-                        action='store', help='sift algorithm provider, opencv or silx', required=False)
+                        action='store', help='match algorithm provider, opencv, silx or template', required=False)
     parser.add_argument('--no-clean', help='no clean cache file', action='store_true')
     parser.add_argument('--save-progress', help='save split progress', action='store_true')
+    parser.add_argument('--serve', dest='serve', metavar='HOST:PORT', action='store',
+                        help='split with remote workers connecting to HOST:PORT')
+    parser.add_argument('--worker', dest='worker', metavar='HOST:PORT', action='store',
+                        help='run as split worker of the coordinator at HOST:PORT')
+    parser.add_argument('--daemon', dest='daemon', metavar='SOCKET', action='store',
+                        help='keep features in memory and serve jobs on unix SOCKET')
+    parser.add_argument('--send', dest='send', metavar=('SOCKET', 'JOB'), nargs='+', action='store',
+                        help='send JOB [KEY=VALUE ...] to the daemon on SOCKET: '
+                             'split, regrid, draw, status, invalidate, shutdown')
 
     args = parser.parse_args()
 
@@ -41,24 +49,63 @@ def main():
         sys.exit(0)
     config = ConfigProxy.load_config(config_path)
 
-    solver = Solver(config, args.no_clean, args.save_progress, metadata_csv=args.metadata)
-    auto = False
+    if args.send:
+        from solver.daemon import send_job
+        if len(args.send) < 2:
+            parser.error('--send 需要 SOCKET 和 JOB 参数')
+        socket_path, job, *params = args.send
+        try:
+            result = send_job(socket_path, config.authkey, job, **dict(p.split('=', 1) for p in params))
+        except (OSError, RuntimeError) as e:
+            logger.error(f'{job} 失败: {e}')
+        else:
+            logger.info(f'{job}: {result}')
+        return
+
+    if (args.serve or args.worker) and config.authkey is None:
+        logger.error('--serve/--worker 需要在配置文件的 [distributed] 中设置 AUTHKEY')
+        sys.exit(0)
 
-    if not any((args.download_csv, args.download_img, args.download_all, args.split, args.draw)):
+    auto = not any((args.download_csv, args.download_img, args.download_all, args.split, args.draw,
+                    args.daemon, args.worker))
+    if args.daemon or args.worker or args.split or args.draw or auto:
+        from solver import Solver
+        solver = Solver(config, args.no_clean, args.save_progress, metadata_csv=args.metadata)
+    else:
+        # 仅下载时不需要匹配相关的 cv2/numpy 等模块
+        from solver.fetcher import PortalFetcher
+        solver = PortalFetcher(config, args.no_clean, metadata_csv=args.metadata)
+
+    if args.daemon:
+        from solver.daemon import SolverDaemon
+        SolverDaemon(solver, args.daemon, config.max_cache_mb).run()
+        return
+
+    if args.worker:
+        from solver.distributed import parse_address
+        logger.info(f'作为 Worker 连接到 {args.worker}')
+        solver.run_worker(parse_address(args.worker))
+        return
+
+    if auto:
         logger.info(f'使用配置文件({args.config})进行自动处理')
-        auto = True
 
-    if args.download_csv or args.download_all or auto:
+    if args.download_all or auto:
+        logger.info('下载 Portal 元数据及照片')
+        asyncio.run(solver.download_all())
+
+    if args.download_csv:
         logger.info('下载 Portal 元数据')
         asyncio.run(solver.download_csv())
 
-    if args.download_img or args.download_all or auto:
+    if args.download_img:
         logger.info('下载 Portal 照片')
         asyncio.run(solver.download_images())
 
     if args.split or auto:
+        from solver.distributed import parse_address
         logger.info('识别图中的 Portal 照片')
-        asyncio.run(solver.split_picture(args.method))
+        asyncio.run(solver.split_picture(args.method, parse_address(args.serve) if args.serve else None))
 
     if args.draw or auto:
         logger.info('生成 Passcode 图像')
@@ -1 +1,6 @@
-from .solver import Solver
\ No newline at end of file
+# Solver 依赖 cv2/numpy 等较重的模块，延迟到首次访问时再导入
+def __getattr__(name):
+    if name == 'Solver':
+        from .solver import Solver
+        return Solver
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
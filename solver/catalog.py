@@ -0,0 +1,159 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Set, Optional, Tuple
+
+from .types import PathType
+from .utils import parse_portal_filename
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS portals (
+    filename TEXT PRIMARY KEY,
+    name TEXT,
+    lat TEXT,
+    lng TEXT,
+    image TEXT,
+    downloaded INTEGER NOT NULL DEFAULT 0,
+    content_hash TEXT,
+    error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_portals_downloaded ON portals (downloaded);
+CREATE TABLE IF NOT EXISTS features (
+    filename TEXT NOT NULL,
+    method TEXT NOT NULL,
+    cache_path TEXT NOT NULL,
+    content_hash TEXT,
+    updated_at REAL,
+    PRIMARY KEY (filename, method)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    content_hash TEXT NOT NULL,
+    match_key TEXT NOT NULL,
+    contours TEXT NOT NULL,
+    cells TEXT,
+    updated_at REAL,
+    PRIMARY KEY (content_hash, match_key)
+);
+"""
+
+
+class PortalCatalog:
+
+    def __init__(self, db_path: PathType):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def get_content_hash(content: bytes) -> str:
+        return hashlib.md5(content).hexdigest()
+
+    def update_portals(self, portals_list: List[dict]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO portals (filename, name, lat, lng, image, updated_at) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (filename) DO UPDATE SET name = excluded.name, lat = COALESCE(lat, excluded.lat), '
+                'lng = COALESCE(lng, excluded.lng), image = COALESCE(image, excluded.image)',
+                ((parse_portal_filename(p['Image'], p['Latitude'], p['Longitude']),
+                  p['Name'], p['Latitude'], p['Longitude'], p['Image'], now) for p in portals_list)
+            )
+
+    def downloaded_filenames(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute('SELECT filename FROM portals WHERE downloaded = 1')}
+
+    def is_downloaded(self, image_path: Path, downloaded: Set[str]) -> bool:
+        # 索引中已下载的照片不再逐个检查文件，缺失的照片在读取时发现并调用 mark_missing
+        if image_path.name in downloaded:
+            return True
+        if not image_path.exists():
+            return False
+        # 建立索引之前已经下载的照片
+        self.mark_downloaded(image_path.name, self.get_content_hash(image_path.read_bytes()))
+        return True
+
+    def mark_downloaded(self, filename: str, content_hash: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO portals (filename, downloaded, content_hash, updated_at) VALUES (?, 1, ?, ?) '
+                'ON CONFLICT (filename) DO UPDATE SET downloaded = 1, content_hash = excluded.content_hash, '
+                'error = NULL, updated_at = excluded.updated_at',
+                (filename, content_hash, time.time())
+            )
+
+    def mark_error(self, filename: str, error: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO portals (filename, error, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (filename) DO UPDATE SET downloaded = 0, error = excluded.error, '
+                'updated_at = excluded.updated_at',
+                (filename, error, time.time())
+            )
+
+    def mark_missing(self, filename: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE portals SET downloaded = 0, content_hash = NULL, updated_at = ? WHERE filename = ?',
+                (time.time(), filename)
+            )
+
+    def content_hash(self, filename: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute('SELECT content_hash FROM portals WHERE filename = ?', (filename,)).fetchone()
+        return row[0] if row else None
+
+    def get_feature(self, filename: str, method: str) -> Optional[Tuple[Path, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT cache_path, content_hash FROM features WHERE filename = ? AND method = ?', (filename, method)
+            ).fetchone()
+        return (Path(row[0]), row[1]) if row else None
+
+    def save_feature(self, filename: str, method: str, cache_path: PathType, content_hash: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO features (filename, method, cache_path, content_hash, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (filename, method, str(cache_path), content_hash, time.time())
+            )
+
+    def get_match(self, content_hash: str, match_key: str) -> Optional[Tuple[list, Optional[List[int]]]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT contours, cells FROM matches WHERE content_hash = ? AND match_key = ?',
+                (content_hash, match_key)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1]) if row[1] is not None else None
+
+    def save_match(self, content_hash: str, match_key: str, contours: list, cells: Optional[List[int]] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO matches (content_hash, match_key, contours, cells, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (content_hash, match_key, json.dumps(contours), json.dumps(cells) if cells is not None else None,
+                 time.time())
+            )
+
+    def clear_matches(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM matches')
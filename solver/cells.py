@@ -0,0 +1,94 @@
+import copy
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .draw_utils import get_cnt_center
+from .types import FeaturesType
+
+BoxType = Tuple[int, int, int, int]
+
+
+def count_features(features: FeaturesType) -> int:
+    if features is None:
+        return 0
+    return len(features[0]) if isinstance(features, tuple) else len(features)
+
+
+class CellSet:
+
+    def __init__(self,
+                 boxes: List[BoxType],
+                 capacities: List[int],
+                 features: List[FeaturesType],
+                 ):
+        self.boxes = boxes
+        self.capacities = [c if count_features(f) >= 4 else 0 for c, f in zip(capacities, features)]
+        self.features = features
+        self._counts = [0] * len(boxes)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    @property
+    def pending(self) -> List[int]:
+        with self._lock:
+            return [i for i, (n, c) in enumerate(zip(self._counts, self.capacities)) if n < c]
+
+    @property
+    def counts(self) -> List[int]:
+        with self._lock:
+            return list(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts[:] = [0] * len(self._counts)
+
+    def update_counts(self, counts: List[int]):
+        with self._lock:
+            self._counts[:] = [max(a, b) for a, b in zip(self._counts, counts)]
+
+    def is_done(self) -> bool:
+        return not self.pending
+
+    def with_features(self, features: List[FeaturesType]) -> 'CellSet':
+        cell_set = copy.copy(self)
+        cell_set.features = features
+        return cell_set
+
+    def locate(self, point: Tuple[int, int]) -> Optional[int]:
+        px, py = point
+        for i, (x, y, w, h) in enumerate(self.boxes):
+            if x <= px < x + w and y <= py < y + h:
+                return i
+        return None
+
+    def _add(self, index: int) -> bool:
+        with self._lock:
+            if self._counts[index] >= self.capacities[index]:
+                return False
+            self._counts[index] += 1
+            return True
+
+    def accept(self, contour: np.ndarray) -> bool:
+        index = self.locate(get_cnt_center(np.array(contour)))
+        return index is None or self._add(index)
+
+    def restore(self, contours: Iterable[np.ndarray]):
+        for cnt in contours:
+            self.accept(cnt)
+
+    def match_cells(self,
+                    matcher_func: Callable,
+                    src_shape: Tuple[int, int, int],
+                    src_features: FeaturesType,
+                    indexes: Iterable[int],
+                    ) -> List[Tuple[int, np.ndarray]]:
+        indexes = [index for index in indexes if count_features(self.features[index]) >= 4]
+        results = matcher_func(src_shape, src_features, [self.features[index] for index in indexes])
+        return [(index, cnt) for index, contours in zip(indexes, results) for cnt in contours]
+
+    def accept_cells(self, matches: Iterable[Tuple[int, np.ndarray]]) -> List[np.ndarray]:
+        return [cnt for index, cnt in matches if self._add(index)]
@@ -1,5 +1,6 @@
 from configparser import ConfigParser
 from pathlib import Path
+from typing import List
 
 from .types import PathType
 
@@ -16,6 +17,9 @@ class ConfigProxy:
         self.output_dir = Path(self._config.get('common', 'OUTPUT_DIR'))
         self.ifs_image_path = Path(self._config.get('ifs', 'IFS_IMAGE'))
         self.column = self._config.getint('ifs', 'COLUMN')
+        self.segment = self._config.getboolean('ifs', 'SEGMENT', fallback=True)
+        self.max_cache_mb = self._config.getint('daemon', 'MAX_CACHE_MB', fallback=1024)
+        self.authkey = self._config.get('distributed', 'AUTHKEY', fallback='').encode('utf-8') or None
         self.proxy = self._config.get('proxy', 'url') \
             if self._config.getboolean('proxy', 'enable', fallback=False) else None
         self._prepare_and_check()
@@ -28,6 +32,57 @@ class ConfigProxy:
             deviceid=self._config.getint('silx', 'deviceid', fallback=None)
         )
 
+    @property
+    def descriptor(self) -> dict:
+        return dict(
+            rootsift=self._config.getboolean('descriptor', 'ROOTSIFT', fallback=False),
+            pca_dims=self._config.getint('descriptor', 'PCA_DIMS', fallback=0),
+            dtype=self._config.get('descriptor', 'DTYPE', fallback='float32'),
+        )
+
+    @property
+    def match(self) -> dict:
+        return dict(
+            budget=self._config.getint('match', 'BUDGET', fallback=0),
+            dst_budget=self._config.getint('match', 'DST_BUDGET', fallback=0),
+            escalate=self._config.get('match', 'ESCALATE', fallback='miss'),
+            model=self._config.get('match', 'MODEL', fallback='homography'),
+        )
+
+    @property
+    def distributed(self) -> dict:
+        return dict(
+            lease_size=self._config.getint('distributed', 'LEASE_SIZE', fallback=4),
+            lease_timeout=self._config.getfloat('distributed', 'LEASE_TIMEOUT', fallback=300),
+        )
+
+    @property
+    def template(self) -> dict:
+        scales = self._config.get('template', 'SCALES', fallback='1.0, 0.95, 0.9, 0.85, 0.8')
+        return dict(
+            scales=tuple(float(s) for s in scales.split(',')),
+            threshold=self._config.getfloat('template', 'THRESHOLD', fallback=0.8),
+        )
+
+    @property
+    def download(self) -> dict:
+        return dict(
+            min_download_workers=self._config.getint('download', 'MIN_WORKERS', fallback=2),
+            max_download_workers=self._config.getint('download', 'MAX_WORKERS', fallback=32),
+            http2=self._config.getboolean('download', 'HTTP2', fallback=False),
+        )
+
+    @property
+    def silx_devices(self) -> List[dict]:
+        devices = self._config.get('silx', 'devices', fallback='')
+        if not devices.strip():
+            return [self.silx]
+        devicetype = self._config.get('silx', 'devicetype', fallback='all')
+        return [
+            dict(devicetype=devicetype, platformid=int(platformid), deviceid=int(deviceid))
+            for platformid, deviceid in (d.strip().split(':') for d in devices.split(','))
+        ]
+
     @property
     def portal_images_dir(self) -> Path:
         return self.temp_dir.joinpath('images')
@@ -36,6 +91,10 @@ class ConfigProxy:
     def portal_features_dir(self) -> Path:
         return self.temp_dir.joinpath('features')
 
+    @property
+    def catalog_db(self) -> Path:
+        return self.temp_dir.joinpath('catalog.db')
+
     @property
     def output_sub_dir(self) -> Path:
         return self.output_dir.joinpath(self.ifs_image_path.stem)
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import os
+import resource
+import time
+from multiprocessing.connection import Listener, Client
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .types import PathType
+
+if TYPE_CHECKING:
+    from .solver import Solver
+
+JOBS = ('split', 'regrid', 'draw', 'status', 'invalidate', 'shutdown')
+INVALIDATE_TARGETS = ('ifs', 'features', 'matches', 'all')
+
+
+class SolverDaemon:
+
+    def __init__(self, solver: 'Solver', socket_path: PathType, max_cache_mb: int):
+        from .feature_cache import FeatureMemoryCache
+        self.solver = solver
+        self.socket_path = Path(socket_path)
+        self.solver.feature_cache = FeatureMemoryCache(max_cache_mb * 1024 * 1024)
+        self.logger = logging.getLogger(__name__)
+
+    def run(self):
+        self.socket_path.unlink(missing_ok=True)
+        # 套接字仅允许当前用户连接
+        umask = os.umask(0o177)
+        try:
+            listener = Listener(str(self.socket_path), family='AF_UNIX', authkey=self.solver.config.authkey)
+        finally:
+            os.umask(umask)
+        self.logger.info(f'守护进程已启动，监听 {str(self.socket_path)}')
+        try:
+            running = True
+            while running:
+                with listener.accept() as conn:
+                    try:
+                        job, params = conn.recv()
+                    except EOFError:
+                        continue
+                    running = job != 'shutdown'
+                    start = time.perf_counter()
+                    try:
+                        result = self.handle(job, **params)
+                    except Exception as e:
+                        self.logger.exception(f'任务 {job} 失败')
+                        conn.send(('error', repr(e)))
+                    else:
+                        self.logger.info(f'任务 {job} 完成，用时 {time.perf_counter() - start:.2f} 秒')
+                        conn.send(('ok', result))
+        finally:
+            listener.close()
+            self.socket_path.unlink(missing_ok=True)
+
+    def handle(self, job: str, **params) -> Any:
+        if job not in JOBS:
+            raise ValueError(f'不支持的任务 {job}，可选 {", ".join(JOBS)}')
+        if job == 'split':
+            self.solver.match_state.refresh(self.solver.metadata_csv)
+            asyncio.run(self.solver.split_picture(params.get('method', 'opencv')))
+            return self.status()
+        if job == 'regrid':
+            self.solver.regrid(int(params['column']) if 'column' in params else None)
+            return self.status()
+        if job == 'draw':
+            self.solver.draw_passcode()
+            return str(self.solver.config.passcode_jpg)
+        if job == 'invalidate':
+            target = params.get('target', 'all')
+            if target not in INVALIDATE_TARGETS:
+                raise ValueError(f'不支持的失效目标 {target}，可选 {", ".join(INVALIDATE_TARGETS)}')
+            self.solver.invalidate(target)
+        return self.status()
+
+    def status(self) -> dict:
+        cache = self.solver.feature_cache
+        return dict(
+            resident=list(self.solver._resident),
+            column=self.solver.config.column,
+            index=self.solver.match_state.index,
+            matches=len(self.solver.match_state.match_cnts),
+            feature_cache=dict(entries=len(cache), mb=round(cache.nbytes / 1024 / 1024, 1),
+                               limit_mb=round(cache.max_bytes / 1024 / 1024, 1), hits=cache.hits, misses=cache.misses),
+            max_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        )
+
+
+def send_job(socket_path: PathType, authkey: bytes, job: str, **params) -> Any:
+    with Client(str(socket_path), family='AF_UNIX', authkey=authkey) as conn:
+        conn.send((job, params))
+        status, result = conn.recv()
+    if status == 'error':
+        raise RuntimeError(result)
+    return result
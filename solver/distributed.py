@@ -0,0 +1,179 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import Listener, Client, Connection
+from typing import Any, Callable, Dict, Iterator, Sequence, Tuple
+
+from .cells import CellSet
+
+LEASE_SIZE = 4
+LEASE_TIMEOUT = 300
+WAIT_INTERVAL = 1.0
+
+
+class Coordinator:
+
+    def __init__(self,
+                 address: Tuple[str, int],
+                 authkey: bytes,
+                 setup: dict,
+                 cell_set: CellSet = None,
+                 lease_size: int = LEASE_SIZE,
+                 lease_timeout: float = LEASE_TIMEOUT,
+                 ):
+        self.address = address
+        self.authkey = authkey
+        self.setup = setup
+        self.cell_set = cell_set
+        self.lease_size = lease_size
+        self.lease_timeout = lease_timeout
+        self.logger = logging.getLogger(__name__)
+
+    def map(self, jobs: Sequence) -> Iterator[Tuple[Any, Any]]:
+        jobs = list(jobs)
+        waiting = deque(range(len(jobs)))
+        completed = set()
+        leases: Dict[int, list] = {}
+        results = queue.Queue()
+        lock = threading.Lock()
+        stop = threading.Event()
+        lease_ids = iter(range(1, 1 << 62))
+
+        def requeue(lease_id: int):
+            _, remaining, _ = leases.pop(lease_id)
+            waiting.extendleft(sorted(remaining - completed, reverse=True))
+
+        def grant(conn_id: int):
+            with lock:
+                indexes = []
+                while waiting and len(indexes) < self.lease_size:
+                    index = waiting.popleft()
+                    if index not in completed:
+                        indexes.append(index)
+                if not indexes:
+                    return ('wait', WAIT_INTERVAL) if leases else ('done',)
+                lease_id = next(lease_ids)
+                leases[lease_id] = [conn_id, set(indexes), time.monotonic() + self.lease_timeout]
+            counts = self.cell_set.counts if self.cell_set is not None else None
+            return 'lease', lease_id, [(index, jobs[index]) for index in indexes], counts
+
+        def receive(lease_id: int, index: int, result):
+            with lock:
+                if index in completed:
+                    return
+                completed.add(index)
+                if lease_id in leases:
+                    lease = leases[lease_id]
+                    lease[1].discard(index)
+                    lease[2] = time.monotonic() + self.lease_timeout
+                    if not lease[1]:
+                        del leases[lease_id]
+            if result is not None and self.cell_set is not None:
+                result = [cnt for cnt in result if self.cell_set.accept(cnt)]
+            results.put((jobs[index], result))
+
+        def handle(conn: Connection, conn_id: int):
+            try:
+                while not stop.is_set():
+                    message = conn.recv()
+                    if message[0] == 'hello':
+                        conn.send(('setup', self.setup))
+                    elif message[0] == 'lease':
+                        conn.send(('done',) if stop.is_set() else grant(conn_id))
+                    elif message[0] == 'result':
+                        receive(*message[1:])
+            except (EOFError, OSError):
+                pass
+            finally:
+                with lock:
+                    for lease_id in [k for k, v in leases.items() if v[0] == conn_id]:
+                        self.logger.warning(f'Worker #{conn_id} 断开，重新分配租约 {lease_id}')
+                        requeue(lease_id)
+                conn.close()
+
+        handlers = []
+
+        def accept(listener: Listener):
+            for conn_id in range(1, 1 << 62):
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError):
+                    if stop.is_set():
+                        return
+                    continue
+                self.logger.info(f'Worker #{conn_id} 已连接: {listener.last_accepted}')
+                handler = threading.Thread(target=handle, args=(conn, conn_id), daemon=True)
+                handler.start()
+                handlers.append(handler)
+
+        listener = Listener(self.address, authkey=self.authkey)
+        self.logger.info(f'等待 Worker 连接 {self.address[0]}:{self.address[1]}')
+        threading.Thread(target=accept, args=(listener,), daemon=True).start()
+        try:
+            received = 0
+            while received < len(jobs):
+                try:
+                    job, result = results.get(timeout=1.0)
+                except queue.Empty:
+                    now = time.monotonic()
+                    with lock:
+                        for lease_id in [k for k, v in leases.items() if v[2] < now]:
+                            self.logger.warning(f'租约 {lease_id} 超时，重新分配')
+                            requeue(lease_id)
+                    continue
+                received += 1
+                yield job, result
+        finally:
+            stop.set()
+            listener.close()
+            # 等待中的 worker 下一次请求租约时会收到 done，稍等片刻让它们正常退出
+            deadline = time.monotonic() + 2 * WAIT_INTERVAL
+            for handler in list(handlers):
+                handler.join(max(0.0, deadline - time.monotonic()))
+
+
+class Worker:
+
+    def __init__(self,
+                 address: Tuple[str, int],
+                 authkey: bytes,
+                 make_worker: Callable[[dict], Tuple[Callable[[Any], Any], CellSet]],
+                 ):
+        self.address = address
+        self.authkey = authkey
+        self.make_worker = make_worker
+        self.logger = logging.getLogger(__name__)
+
+    def run(self):
+        try:
+            self._run()
+        except (EOFError, OSError) as e:
+            self.logger.info(f'与协调进程的连接已断开: {e!r}')
+
+    def _run(self):
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send(('hello',))
+            _, setup = conn.recv()
+            worker, cell_set = self.make_worker(setup)
+            self.logger.info(f'已连接到 {self.address[0]}:{self.address[1]}，开始匹配')
+            while True:
+                conn.send(('lease',))
+                message = conn.recv()
+                if message[0] == 'done':
+                    break
+                if message[0] == 'wait':
+                    time.sleep(message[1])
+                    continue
+                _, lease_id, jobs, counts = message
+                if cell_set is not None and counts is not None:
+                    cell_set.update_counts(counts)
+                for index, job in jobs:
+                    conn.send(('result', lease_id, index, worker(job)))
+        self.logger.info('所有任务已完成')
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
@@ -25,20 +25,42 @@ def get_passcode(lnglat_list: List[Tuple[int, List[Tuple[float, float]]]],
     cv.imwrite(str(output_filename), canvas)
 
 
-def get_picture_max_border(image_path: PathType, thresh: int = 200,
-                           BGR_std: Tuple[int, int, int] = (50, 50, 50)
-                           ) -> Tuple[int, int]:
-    img = cv.imread(str(image_path))
-    std = np.array(BGR_std)
-    img_binary = cv.inRange(np.sum(np.power(img - std, 2), axis=2), 0, thresh)
-    contours: list[np.ndarray]
-    contours, _ = cv.findContours(255 - img_binary, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+def get_foreground_contours(img: np.ndarray, thresh: int = 200,
+                            BGR_std: Tuple[int, int, int] = (50, 50, 50)
+                            ) -> List[np.ndarray]:
+    diff = img.astype(np.int16) - np.array(BGR_std, dtype=np.int16)
+    img_foreground = np.where(np.einsum('ijk,ijk->ij', diff, diff, dtype=np.int32) > thresh, 255, 0)
+    contours, _ = cv.findContours(img_foreground.astype(np.uint8), cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+    return list(contours)
+
+
+def get_contours_max_border(contours: List[np.ndarray]) -> Tuple[int, int]:
     pt_max = [np.max(cnt, axis=0) for cnt in contours]
     xy_max = np.max(np.array(pt_max), axis=0)
     x, y = xy_max.ravel()
     return x, y
 
 
+def get_picture_max_border(image_path: PathType, thresh: int = 200,
+                           BGR_std: Tuple[int, int, int] = (50, 50, 50)
+                           ) -> Tuple[int, int]:
+    img = cv.imread(str(image_path))
+    return get_contours_max_border(get_foreground_contours(img, thresh, BGR_std))
+
+
+def get_picture_cells(contours: List[np.ndarray], min_area_ratio: float = 0.25,
+                      ) -> List[Tuple[Tuple[int, int, int, int], int]]:
+    boxes = [cv.boundingRect(cnt) for cnt in contours]
+    if not any(boxes):
+        return []
+    median_area = np.median([w * h for _, _, w, h in boxes])
+    return sorted(
+        ((box, max(1, int(round(box[2] * box[3] / median_area)))) for box in boxes
+         if box[2] * box[3] >= min_area_ratio * median_area),
+        key=lambda k: (k[0][0], k[0][1])
+    )
+
+
 def get_cnt_center(contour: np.ndarray) -> Tuple[int, int]:
     MM = cv.moments(contour)
     return int(MM['m10'] / MM['m00']), int(MM['m01'] / MM['m00'])
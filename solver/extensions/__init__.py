@@ -1,2 +1,11 @@
-from .sift_silx import *
-from .sift_opencv import *
+from importlib import import_module
+
+
+# sift_silx 会加载 pyopencl，两个实现都按需导入；同名时与原先一样以 sift_opencv 为准
+def __getattr__(name):
+    if not name.startswith('_'):
+        for module in ('sift_opencv', 'sift_silx'):
+            module = import_module(f'{__name__}.{module}')
+            if hasattr(module, name):
+                return getattr(module, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
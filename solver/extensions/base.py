@@ -1,21 +1,52 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union, List, Tuple
+from typing import Union, List, Optional, Tuple
 
 import cv2 as cv
 import numpy as np
 
 from ..feature_utils import load_features, unpack_features, save_features, pack_features
 from ..types import PathType, FeaturesType, PackType
+from .compress import DescriptorCompressor
 
 
 class FeatureExtractor:
     method = 'default'
 
-    def __init__(self, enable_cache: bool = True):
+    def __init__(self, enable_cache: bool = True, compressor: DescriptorCompressor = None):
         self.enable_cache = enable_cache
+        self.compressor = compressor if compressor is not None and compressor.enabled else None
         self.logger = logging.getLogger(__name__)
 
+    @property
+    def descriptor_dtype(self) -> type:
+        return np.float32 if self.compressor is None else self.compressor.match_dtype
+
+    @property
+    def pack_dtype(self) -> type:
+        return np.float64 if self.compressor is None else np.float32
+
+    @property
+    def storage_dtype(self) -> Optional[type]:
+        return None if self.compressor is None else self.compressor.storage_dtype
+
+    @property
+    def cache_suffix(self) -> str:
+        return 'npy' if self.compressor is None else 'npz'
+
+    def compress(self, descriptors: np.ndarray) -> np.ndarray:
+        return descriptors if self.compressor is None else self.compressor.compress(descriptors)
+
+    def to_pack(self, features: FeaturesType) -> PackType:
+        kp, des = features
+        if not kp:
+            return np.empty((0, 7), dtype=self.pack_dtype)
+        return pack_features(kp, des, self.pack_dtype)
+
+    def from_pack(self, pack: PackType) -> FeaturesType:
+        return unpack_features(pack, self.descriptor_dtype)
+
     def get_image(self, image_path: PathType) -> np.ndarray:
         return cv.imread(str(image_path), cv.IMREAD_GRAYSCALE)
 
@@ -23,14 +54,37 @@ class FeatureExtractor:
                            image_path: PathType,
                            return_pack: bool = False,
                            ) -> Union[FeaturesType, PackType]:
+        return self.get_array_features(self.get_image(image_path), return_pack=return_pack)
+
+    def get_array_features(self,
+                           image: np.ndarray,
+                           return_pack: bool = False,
+                           ) -> Union[FeaturesType, PackType]:
         pass
 
+    def shift_features(self, features: FeaturesType, dx: int, dy: int) -> FeaturesType:
+        kp, des = features
+        return [cv.KeyPoint(x=k.pt[0] + dx, y=k.pt[1] + dy, size=k.size, angle=k.angle, response=k.response,
+                            octave=k.octave, class_id=k.class_id) for k in kp], des
+
+    def get_cells_features(self,
+                           image: np.ndarray,
+                           boxes: List[Tuple[int, int, int, int]],
+                           max_workers: int = 1,
+                           ) -> List[FeaturesType]:
+        def extract(box):
+            x, y, w, h = box
+            return self.shift_features(self.get_array_features(image[y:y + h, x:x + w]), x, y)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(extract, boxes))
+
     def get_cache_features(self,
                            cache_path: PathType,
                            return_pack: bool = False,
                            ) -> Union[FeaturesType, PackType]:
         features = load_features(str(cache_path))
-        return features if return_pack else unpack_features(features)
+        return features if return_pack else unpack_features(features, self.descriptor_dtype)
 
     def get_features(self,
                      image_path: PathType,
@@ -45,7 +99,8 @@ class FeatureExtractor:
         if Path(image_path).exists():
             features = self.get_image_features(str(image_path), return_pack=return_pack)
             if cache_path is not None:
-                save_features(cache_path, features if return_pack else pack_features(*features))
+                save_features(cache_path, features if return_pack else pack_features(*features, self.pack_dtype),
+                              self.storage_dtype)
             return features
         else:
             self.logger.warning(f'目标文件({str(image_path)}不存在，无法计算)')
@@ -56,24 +111,180 @@ class FeatureExtractor:
                                cache_path: PathType = None,
                                return_pack: bool = False,
                                ) -> Tuple[Union[FeaturesType, PackType, None], tuple]:
-        return self.get_features(image_path, cache_path, return_pack), self.get_image(image_path).shape
+        image = self.get_image(image_path)
+        return self.get_features(image_path, cache_path, return_pack), image.shape if image is not None else None
+
+
+ESCALATE_POLICIES = ('miss', 'weak', 'never')
+GEOMETRY_MODELS = ('homography', 'affine', 'similarity', 'scale')
+SHAPE_THRESHOLD = 0.05
+ASPECT_TOLERANCE = 0.05
+SIZE_TOLERANCE = 0.3
+MIN_INLIERS = 4
+# SIFT 在目标图像中能检测到的最小关键点直径约为 2 像素
+MIN_KEYPOINT_SIZE = 2.0
+
+
+def _fit_scale_translation(src_pts: np.ndarray,
+                           dst_pts: np.ndarray,
+                           mask: np.ndarray,
+                           threshold: float,
+                           ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    # 在相似变换 RANSAC 的内点上用最小二乘拟合 (s, tx, ty)，再按该模型重新计算内点
+    src, dst = src_pts.reshape(-1, 2).astype(np.float64), dst_pts.reshape(-1, 2).astype(np.float64)
+    inliers = mask.ravel().astype(bool)
+    if inliers.sum() < 2:
+        return None, None
+    src_mean, dst_mean = src[inliers].mean(axis=0), dst[inliers].mean(axis=0)
+    a, b = src[inliers] - src_mean, dst[inliers] - dst_mean
+    s = (a * b).sum() / max((a * a).sum(), 1e-12)
+    if s <= 0:
+        return None, None
+    tx, ty = dst_mean - s * src_mean
+    inliers = ((dst - (s * src + (tx, ty))) ** 2).sum(axis=1) < threshold ** 2
+    return np.array([[s, 0, tx], [0, s, ty], [0, 0, 1]]), inliers.astype(np.uint8).reshape(-1, 1)
+
+
+def estimate_transform(src_pts: np.ndarray,
+                       dst_pts: np.ndarray,
+                       model: str = 'homography',
+                       threshold: float = 10.0,
+                       ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    if model == 'homography':
+        return cv.findHomography(src_pts, dst_pts, cv.RANSAC, threshold)
+    estimate = cv.estimateAffine2D if model == 'affine' else cv.estimateAffinePartial2D
+    M, mask = estimate(src_pts, dst_pts, method=cv.RANSAC, ransacReprojThreshold=threshold)
+    if model == 'scale' and M is not None:
+        M, mask = _fit_scale_translation(src_pts, dst_pts, mask, threshold)
+    # 自由度较低的模型几个点就能凑出一致的假设，要求足够多且分布足够开的内点
+    if M is None or mask.sum() < MIN_INLIERS or \
+            np.ptp(dst_pts.reshape(-1, 2)[mask.ravel().astype(bool)], axis=0).min() < threshold:
+        return None, None
+    return M if M.shape[0] == 3 else np.vstack([M, (0, 0, 1)]), mask
+
+
+def check_contour(src_cnt: np.ndarray,
+                  dst_cnt: np.ndarray,
+                  model: str = 'homography',
+                  cell_size: Tuple[int, Optional[int]] = None,
+                  ) -> bool:
+    if model == 'homography':
+        return cv.matchShapes(src_cnt, dst_cnt, cv.CONTOURS_MATCH_I1, 0.000) < SHAPE_THRESHOLD
+    # IFS 中的照片均为轴对齐、等比缩放的矩形，要求角点贴合外接矩形且宽高比不变
+    src, dst = src_cnt.reshape(-1, 2), dst_cnt.reshape(-1, 2)
+    (src_x, src_y), (dst_x, dst_y) = np.ptp(src, axis=0), np.ptp(dst, axis=0)
+    if min(dst_x, dst_y) < 1:
+        return False
+    # 低自由度模型投影出的矩形天然满足宽高比，几个内点就能拟合出缩小的框，
+    # 还需要与照片单元的尺寸一致
+    if cell_size is not None:
+        cell_w, cell_h = cell_size
+        if abs(dst_x / cell_w - 1) > SIZE_TOLERANCE or (cell_h and abs(dst_y / cell_h - 1) > SIZE_TOLERANCE):
+            return False
+    corners = np.array([[0, 0], [0, 1], [1, 1], [1, 0]]) * (dst_x, dst_y) + dst.min(axis=0)
+    deviation = np.abs(dst - corners).max() / max(dst_x, dst_y)
+    return deviation < ASPECT_TOLERANCE and abs((dst_x / dst_y) / (src_x / src_y) - 1) < ASPECT_TOLERANCE
 
 
 class FeatureMatcher:
 
+    def __init__(self,
+                 budget: int = 0,
+                 dst_budget: int = 0,
+                 escalate: str = 'miss',
+                 model: str = 'homography',
+                 cell_size: Tuple[int, Optional[int]] = None,
+                 ):
+        if escalate not in ESCALATE_POLICIES:
+            raise ValueError(f'不支持的升级策略 {escalate}，可选 {", ".join(ESCALATE_POLICIES)}')
+        if model not in GEOMETRY_MODELS:
+            raise ValueError(f'不支持的几何模型 {model}，可选 {", ".join(GEOMETRY_MODELS)}')
+        self.budget = budget
+        self.dst_budget = dst_budget
+        self.escalate = escalate
+        self.model = model
+        self.cell_size = cell_size
+        self._top_cache = {}
+
+    @property
+    def params(self) -> dict:
+        params = dict(budget=self.budget, dst_budget=self.dst_budget, escalate=self.escalate, model=self.model)
+        if self.model != 'homography' and self.cell_size is not None:
+            params.update(cell_size=tuple(self.cell_size))
+        return params
+
+    def top_features(self, features: FeaturesType, n: int, min_size: float = 0) -> FeaturesType:
+        return features
+
+    def _get_top_features(self, features: FeaturesType, n: int, cache: bool = False) -> FeaturesType:
+        if n <= 0:
+            return features
+        if not cache:
+            return self.top_features(features, n)
+        key = id(features)
+        if key not in self._top_cache:
+            self._top_cache[key] = (features, self.top_features(features, n))
+        return self._top_cache[key][1]
+
+    def _get_src_top_features(self, src_shape: Tuple[int, int, int], src_features: FeaturesType) -> FeaturesType:
+        if self.budget <= 0 or self.cell_size is None:
+            return self._get_top_features(src_features, self.budget)
+        # 响应最强的多是细尺度关键点，缩小到照片单元后已不存在，只在缩小后仍可检测的关键点中挑选
+        scale = self.cell_size[0] / src_shape[1]
+        return self.top_features(src_features, self.budget, MIN_KEYPOINT_SIZE / scale)
+
+    def match_contours(self,
+                       src_shape: Tuple[int, int, int],
+                       src_features: FeaturesType,
+                       dst_features: FeaturesType,
+                       ) -> Tuple[List[np.ndarray], int]:
+        pass
+
     def get_match_contours(self,
                            src_shape: Tuple[int, int, int],
                            src_features: FeaturesType,
                            dst_features: FeaturesType,
                            ) -> List[np.ndarray]:
-        pass
+        return self.get_cells_match_contours(src_shape, src_features, [dst_features])[0]
+
+    def get_cells_match_contours(self,
+                                 src_shape: Tuple[int, int, int],
+                                 src_features: FeaturesType,
+                                 cells_features: List[FeaturesType],
+                                 ) -> List[List[np.ndarray]]:
+        def match_all(src: FeaturesType, targets: List[FeaturesType]) -> Tuple[List[List[np.ndarray]], int]:
+            results = [self.match_contours(src_shape, src, dst) for dst in targets]
+            return [contours for contours, _ in results], max((num_good for _, num_good in results), default=0)
+
+        if self.budget <= 0 and self.dst_budget <= 0:
+            return match_all(src_features, cells_features)[0]
+        # 首轮对所有照片单元使用预算内的关键点，只要有一个单元命中就不再升级，
+        # 升级与否按 portal 判断，而不是按 (portal, 单元) 逐个判断
+        src_top = self._get_src_top_features(src_shape, src_features)
+        contours, _ = match_all(src_top, [self._get_top_features(f, self.dst_budget, cache=True)
+                                          for f in cells_features])
+        if any(contours) or self.escalate == 'never':
+            return contours
+        if self.escalate == 'weak':
+            # 两侧各自取前 N 个关键点时，真匹配的候选点也很少，不能据此判断；
+            # 改用 portal 的前 BUDGET 个关键点对完整目标试探，候选不足 4 个才视为未匹配
+            contours, num_good = match_all(src_top, cells_features)
+            if any(contours) or num_good < 4 or src_top is src_features:
+                return contours
+        return match_all(src_features, cells_features)[0]
 
 
 class Matches:
 
-    def __init__(self, matches: Union[List[cv.DMatch], np.recarray, np.ndarray]):
+    def __init__(self,
+                 matches: Union[List[cv.DMatch], np.recarray, np.ndarray],
+                 model: str = 'homography',
+                 cell_size: Tuple[int, Optional[int]] = None,
+                 ):
         self._matches = matches
         self._dst_contours = []
+        self.model = model
+        self.cell_size = cell_size
 
     @property
     def matches(self) -> Union[List[cv.DMatch], np.recarray, np.ndarray]:
@@ -88,12 +299,11 @@ class Matches:
                dst_pts: np.ndarray,
                src_cnt: np.ndarray,
                ) -> bool:
-        M, mask = cv.findHomography(src_pts, dst_pts, cv.RANSAC, 10.0)
+        M, mask = estimate_transform(src_pts, dst_pts, self.model, 10.0)
         if M is None:
             return False
         dst = cv.perspectiveTransform(src_cnt, M)
-        s = cv.matchShapes(src_cnt, dst, cv.CONTOURS_MATCH_I1, 0.000)
-        if s < 0.05:
+        if check_contour(src_cnt, dst, self.model, self.cell_size):
             self._dst_contours.append(np.int32(dst))
         self._matches = np.array(self._matches)[np.logical_not(mask.ravel().tolist())]
         return True
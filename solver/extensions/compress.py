@@ -0,0 +1,90 @@
+import hashlib
+from typing import Iterable
+
+import numpy as np
+
+from ..types import PathType
+
+DTYPES = {
+    'float32': (np.float32, np.float32),
+    'float16': (np.float16, np.float32),
+    'uint8': (np.uint8, np.uint8),
+}
+
+
+class DescriptorCompressor:
+
+    def __init__(self,
+                 rootsift: bool = False,
+                 pca_dims: int = 0,
+                 dtype: str = 'float32',
+                 ):
+        if dtype not in DTYPES:
+            raise ValueError(f'不支持的描述子类型 {dtype}，可选 {", ".join(DTYPES)}')
+        self.rootsift = rootsift
+        self.pca_dims = pca_dims
+        self.dtype = dtype
+        self.storage_dtype, self.match_dtype = DTYPES[dtype]
+        self._mean = None
+        self._basis = None
+        self._range = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.rootsift or self.pca_dims > 0 or self.dtype != 'float32'
+
+    @property
+    def name(self) -> str:
+        parts = (['rootsift'] if self.rootsift else []) + \
+                ([f'pca{self.pca_dims}'] if self.pca_dims > 0 else []) + [self.dtype]
+        return '-'.join(parts)
+
+    @property
+    def tag(self) -> str:
+        # 拟合得到的参数不同，压缩后的描述子就不可比较，缓存目录和匹配缓存需随之区分
+        fitted = [a for a in (self._mean, self._basis, self._range) if a is not None]
+        if not fitted:
+            return self.name
+        digest = hashlib.md5(b''.join(np.ascontiguousarray(a).tobytes() for a in fitted)).hexdigest()[:8]
+        return f'{self.name}-{digest}'
+
+    @property
+    def needs_fit(self) -> bool:
+        return (self.pca_dims > 0 and self._basis is None) or (self.dtype == 'uint8' and self._range is None)
+
+    def _project(self, des: np.ndarray) -> np.ndarray:
+        des = np.asarray(des, dtype=np.float32)
+        if self.rootsift:
+            des = np.sqrt(des / (np.abs(des).sum(axis=1, keepdims=True) + 1e-7))
+        if self._basis is not None:
+            des = (des - self._mean) @ self._basis
+        return des
+
+    def fit(self, descriptors: Iterable[np.ndarray]):
+        self._mean, self._basis = None, None
+        des = self._project(np.vstack([d for d in descriptors if d is not None and len(d)]))
+        if self.pca_dims > 0:
+            self._mean = des.mean(axis=0)
+            _, vectors = np.linalg.eigh(np.cov(des - self._mean, rowvar=False))
+            self._basis = np.ascontiguousarray(vectors[:, ::-1][:, :self.pca_dims], dtype=np.float32)
+            des = (des - self._mean) @ self._basis
+        self._range = np.percentile(des, [0.5, 99.5]).astype(np.float32)
+
+    def save(self, filename: PathType):
+        arrays = dict(mean=self._mean, basis=self._basis, range=self._range)
+        np.savez(str(filename), **{k: v for k, v in arrays.items() if v is not None})
+
+    def load(self, filename: PathType):
+        with np.load(str(filename)) as data:
+            self._mean = data['mean'] if 'mean' in data else None
+            self._basis = data['basis'] if 'basis' in data else None
+            self._range = data['range'] if 'range' in data else None
+
+    def compress(self, des: np.ndarray) -> np.ndarray:
+        if des is None or not self.enabled:
+            return des
+        des = self._project(des)
+        if self.dtype == 'uint8':
+            lo, hi = self._range
+            des = np.clip(np.rint((des - lo) * (255 / (hi - lo))), 0, 255)
+        return des.astype(self.storage_dtype).astype(self.match_dtype)
@@ -0,0 +1,112 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque, defaultdict
+from typing import Any, Callable, Iterator, List, Sequence, Tuple
+
+WorkerType = Callable[[Any], Any]
+
+
+class DeviceScheduler:
+
+    def __init__(self,
+                 devices: List[dict],
+                 make_worker: Callable[[dict], WorkerType],
+                 make_fallback: Callable[[], WorkerType] = None,
+                 ):
+        self.devices = devices
+        self.make_worker = make_worker
+        self.make_fallback = make_fallback
+        self.stats = defaultdict(lambda: [0, 0.0])
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def device_name(device: dict) -> str:
+        return f"{device.get('devicetype')}:{device.get('platformid')}:{device.get('deviceid')}"
+
+    def map(self, jobs: Sequence) -> Iterator[Tuple[Any, Any]]:
+        jobs = list(jobs)
+        num_devices = len(self.devices)
+        queues = [deque(jobs[i::num_devices]) for i in range(num_devices)]
+        fallback_queue = deque()
+        alive = set(range(num_devices))
+        results = queue.Queue()
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def steal():
+            victim = max(queues, key=len)
+            return victim.pop() if victim else None
+
+        def take(index: int):
+            with lock:
+                return queues[index].popleft() if queues[index] else steal()
+
+        def fail(index: int, job, error: Exception):
+            self.logger.warning(f'设备 {self.device_name(self.devices[index])} 出错，停止使用: {error!r}')
+            with lock:
+                alive.discard(index)
+                if job is not None:
+                    (queues[index] if self.make_fallback is None else fallback_queue).append(job)
+                if self.make_fallback is None and not alive:
+                    results.put((None, RuntimeError('没有可用的 OpenCL 设备')))
+
+        def execute(name: str, worker: WorkerType, job):
+            start = time.perf_counter()
+            result = worker(job)
+            self.stats[name][0] += 1
+            self.stats[name][1] += time.perf_counter() - start
+            results.put((job, result))
+
+        def run_device(index: int):
+            name = f'#{index} {self.device_name(self.devices[index])}'
+            job = None
+            try:
+                worker = self.make_worker(self.devices[index])
+                while not stop.is_set():
+                    job = take(index)
+                    if job is None:
+                        break
+                    execute(name, worker, job)
+            except Exception as e:
+                fail(index, job, e)
+
+        def run_fallback():
+            worker = None
+            while not stop.is_set():
+                with lock:
+                    job = fallback_queue.popleft() if fallback_queue else None if alive else steal()
+                if job is None:
+                    stop.wait(0.1)
+                    continue
+                try:
+                    worker = worker or self.make_fallback()
+                    execute('fallback', worker, job)
+                except Exception as e:
+                    results.put((None, e))
+                    return
+
+        threads = [threading.Thread(target=run_device, args=(i,), daemon=True) for i in range(num_devices)]
+        if self.make_fallback is not None:
+            threads.append(threading.Thread(target=run_fallback, daemon=True))
+        wall_start = time.perf_counter()
+        for t in threads:
+            t.start()
+        try:
+            for _ in range(len(jobs)):
+                job, result = results.get()
+                if job is None:
+                    raise result
+                yield job, result
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+            self.report(time.perf_counter() - wall_start)
+
+    def report(self, wall_time: float):
+        for name, (count, busy) in self.stats.items():
+            self.logger.info(f'设备 {name}: 处理 {count} 张, {count / busy if busy else 0:.2f} 张/秒')
+        total = sum(count for count, _ in self.stats.values())
+        self.logger.info(f'共处理 {total} 张, {total / wall_time if wall_time else 0:.2f} 张/秒')
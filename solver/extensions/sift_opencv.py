@@ -1,4 +1,5 @@
-from typing import Union, Tuple, List
+import threading
+from typing import Union, Tuple, List, Optional
 
 import cv2 as cv
 import numpy as np
@@ -6,22 +7,31 @@ import numpy as np
 from ..feature_utils import pack_features
 from ..types import PathType, FeaturesType, PackType
 from .base import Matches, FeatureExtractor, FeatureMatcher
+from .compress import DescriptorCompressor
 
 
 class SiftExtractor(FeatureExtractor):
     method = 'opencv'
 
-    def __init__(self, enable_cache: bool = True):
-        super().__init__(enable_cache)
-        self._sift = cv.SIFT_create()
+    def __init__(self, enable_cache: bool = True, compressor: DescriptorCompressor = None):
+        super().__init__(enable_cache, compressor)
+        self._local = threading.local()
+        if self.compressor is not None:
+            self.method = f'{self.method}-{self.compressor.tag}'
 
-    def get_image_features(self,
-                           image_path: PathType,
+    @property
+    def _sift(self) -> cv.SIFT:
+        if not hasattr(self._local, 'sift'):
+            self._local.sift = cv.SIFT_create()
+        return self._local.sift
+
+    def get_array_features(self,
+                           image: np.ndarray,
                            return_pack: bool = False,
                            ) -> Union[FeaturesType, PackType]:
-        image = self.get_image(image_path)
         kp, des = self._sift.detectAndCompute(image, None)
-        return pack_features(kp, des) if return_pack else (kp, des)
+        des = self.compress(des)
+        return pack_features(kp, des, self.pack_dtype) if return_pack else (kp, des)
 
     def get_cache_features(self,
                            cache_path: PathType,
@@ -46,14 +56,29 @@ class SiftExtractor(FeatureExtractor):
 
 class BFMatcher(FeatureMatcher):
 
-    def __init__(self):
+    def __init__(self,
+                 budget: int = 0,
+                 dst_budget: int = 0,
+                 escalate: str = 'miss',
+                 model: str = 'homography',
+                 cell_size: Tuple[int, Optional[int]] = None,
+                 ):
+        super().__init__(budget, dst_budget, escalate, model, cell_size)
         self._matcher = cv.BFMatcher_create()
 
-    def get_match_contours(self,
-                           src_shape: Tuple[int, int, int],
-                           src_features: FeaturesType,
-                           dst_features: FeaturesType,
-                           ) -> List[np.ndarray]:
+    def top_features(self, features: FeaturesType, n: int, min_size: float = 0) -> FeaturesType:
+        kp, des = features
+        if len(kp) <= n:
+            return features
+        # 先取尺寸不小于 min_size 的关键点，再按响应排序
+        index = np.lexsort(([-k.response for k in kp], [k.size < min_size for k in kp]))[:n]
+        return [kp[i] for i in index], des[index]
+
+    def match_contours(self,
+                       src_shape: Tuple[int, int, int],
+                       src_features: FeaturesType,
+                       dst_features: FeaturesType,
+                       ) -> Tuple[List[np.ndarray], int]:
         src_kp, src_des = src_features
         dst_kp, dst_des = dst_features
         h, w, *_ = src_shape
@@ -62,11 +87,14 @@ class BFMatcher(FeatureMatcher):
             np.array(sorted(
                 (m for m, n in self._matcher.knnMatch(src_des, dst_des, k=2) if m.distance < 0.75 * n.distance),
                 key=lambda m: m.distance
-            ))
+            )),
+            self.model,
+            self.cell_size,
         )
+        num_good = len(matches.matches)
         while len(matches.matches) >= 4:
             src_pts = np.float32([src_kp[m.queryIdx].pt for m in matches.matches]).reshape(-1, 1, 2)
             dst_pts = np.float32([dst_kp[m.trainIdx].pt for m in matches.matches]).reshape(-1, 1, 2)
             if not matches.update(src_pts, dst_pts, src_cnt):
                 break
-        return matches.dst_contours
+        return matches.dst_contours, num_good
@@ -1,12 +1,12 @@
 from functools import lru_cache
-from typing import Union, Tuple, List
+from typing import Union, Tuple, List, Optional
 
 import cv2 as cv
 import numpy as np
 from silx.image import sift
 
 from ..types import PathType, FeaturesType, PackType
-from .base import Matches, FeatureExtractor, FeatureMatcher
+from .base import FeatureExtractor, FeatureMatcher, estimate_transform, check_contour
 
 
 class SiftExtractor(FeatureExtractor):
@@ -34,17 +34,31 @@ class SiftExtractor(FeatureExtractor):
             deviceid=self.deviceid
         )
 
-    def get_image_features(self,
-                           image_path: PathType,
+    def get_array_features(self,
+                           image: np.ndarray,
                            return_pack: bool = False,
                            ) -> FeaturesType:
-        image = self.get_image(image_path)
         if max(image.shape) > 768:
             siftp = self._create_sift_plan.__wrapped__(self, image.shape, image.dtype)
         else:
             siftp = self._create_sift_plan(image.shape, image.dtype)
         return siftp.keypoints(image)
 
+    def to_pack(self, features: FeaturesType) -> PackType:
+        return features
+
+    def from_pack(self, pack: PackType) -> FeaturesType:
+        return pack
+
+    def get_cells_features(self,
+                           image: np.ndarray,
+                           boxes: List[Tuple[int, int, int, int]],
+                           max_workers: int = 1,
+                           ) -> List[FeaturesType]:
+        kp = self.get_array_features(image)
+        return [kp[np.logical_and.reduce((kp.x >= x, kp.x < x + w, kp.y >= y, kp.y < y + h))]
+                for x, y, w, h in boxes]
+
     def get_cache_features(self,
                            cache_path: PathType,
                            **kwargs
@@ -72,39 +86,52 @@ class SiftMatcher(FeatureMatcher):
     def __init__(self,
                  devicetype: str = 'all',
                  platformid: int = None,
-                 deviceid: int = None
+                 deviceid: int = None,
+                 budget: int = 0,
+                 dst_budget: int = 0,
+                 escalate: str = 'miss',
+                 model: str = 'homography',
+                 cell_size: Tuple[int, Optional[int]] = None,
                  ):
+        super().__init__(budget, dst_budget, escalate, model, cell_size)
         self._matcher = sift.MatchPlan(
             devicetype=devicetype,
             device=(platformid, deviceid),
         )
 
-    def get_match_contours(self,
-                           src_shape: Tuple[int, int, int],
-                           src_features: FeaturesType,
-                           dst_features: FeaturesType,
-                           ) -> List[np.ndarray]:
+    def top_features(self, features: FeaturesType, n: int, min_size: float = 0) -> FeaturesType:
+        # 按尺度从大到小挑选，本身就优先保留缩小后仍可检测的关键点
+        if len(features) <= n:
+            return features
+        return features[np.argsort(-features.scale)[:n]]
+
+    def match_contours(self,
+                       src_shape: Tuple[int, int, int],
+                       src_features: FeaturesType,
+                       dst_features: FeaturesType,
+                       ) -> Tuple[List[np.ndarray], int]:
         h, w, *_ = src_shape
         src_cnt = np.float32([[0, 0], [0, h - 1], [w - 1, h - 1], [w - 1, 0]]).reshape(-1, 1, 2)
         dst_contours = []
         kp = dst_features
+        num_good = None
         while True:
             matches = self._matcher.match(src_features, kp)
+            num_good = len(matches) if num_good is None else num_good
             if len(matches) < 4:
                 break
             src_des, dst_des = matches[:, 0], matches[:, 1]
             src_pts = src_des[['x', 'y']].astype([('x', '<f4'), ('y', '<f4')]).view('<f4').reshape(-1, 2)
             dst_pts = dst_des[['x', 'y']].astype([('x', '<f4'), ('y', '<f4')]).view('<f4').reshape(-1, 2)
-            M, mask = cv.findHomography(src_pts, dst_pts, cv.RANSAC, 5.0)
+            M, mask = estimate_transform(src_pts, dst_pts, self.model, 5.0)
             if M is None:
                 break
             dst = cv.perspectiveTransform(src_cnt, M)
-            s = cv.matchShapes(src_cnt, dst, cv.CONTOURS_MATCH_I1, 0.000)
-            if s < 0.05:
+            if check_contour(src_cnt, dst, self.model, self.cell_size):
                 dst_contours.append(np.int32(dst))
             x_max, x_min = dst[:, :, 0].max(), dst[:, :, 0].min()
             y_max, y_min = dst[:, :, 1].max(), dst[:, :, 1].min()
             kp = kp[np.where(np.logical_not(
                 np.logical_and.reduce((kp.x < x_max, kp.x > x_min, kp.y < y_max, kp.y > y_min))))]
 
-        return dst_contours
+        return dst_contours, num_good
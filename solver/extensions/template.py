@@ -0,0 +1,179 @@
+from pathlib import Path
+from typing import Union, Tuple, List, Optional
+
+import cv2 as cv
+import numpy as np
+
+from ..feature_utils import load_features, save_features
+from ..types import PathType, FeaturesType, PackType
+from .base import FeatureExtractor, FeatureMatcher
+
+THUMBNAIL_WIDTH = 256
+MIN_TEMPLATE_SIZE = 8
+DIRECT_LIMIT = 4096
+MAX_PEAKS = 8
+NMS_OVERLAP = 0.3
+
+
+class TemplateExtractor(FeatureExtractor):
+    method = 'template'
+
+    def get_array_features(self,
+                           image: np.ndarray,
+                           return_pack: bool = False,
+                           ) -> FeaturesType:
+        return np.float32(image), (0, 0)
+
+    def shift_features(self, features: FeaturesType, dx: int, dy: int) -> FeaturesType:
+        image, (x, y) = features
+        return image, (x + dx, y + dy)
+
+    def to_pack(self, features: FeaturesType) -> PackType:
+        return features
+
+    def from_pack(self, pack: PackType) -> FeaturesType:
+        return pack
+
+    def get_cache_features(self,
+                           cache_path: PathType,
+                           return_pack: bool = False,
+                           ) -> FeaturesType:
+        return load_features(str(cache_path))
+
+    def get_features(self,
+                     image_path: PathType,
+                     cache_path: PathType = None,
+                     return_pack: bool = False,
+                     ) -> Union[FeaturesType, None]:
+        if self.enable_cache and cache_path and Path(cache_path).exists():
+            try:
+                return self.get_cache_features(cache_path)
+            except ValueError:
+                self.logger.warning(f'读取缓存({str(cache_path)})失败，尝试进行计算')
+        image = self.get_image(image_path)
+        if image is None:
+            self.logger.warning(f'目标文件({str(image_path)}不存在，无法计算)')
+            return None
+        h, w = image.shape
+        thumbnail = cv.resize(image, (THUMBNAIL_WIDTH, max(1, round(h * THUMBNAIL_WIDTH / w))),
+                              interpolation=cv.INTER_AREA if w > THUMBNAIL_WIDTH else cv.INTER_CUBIC)
+        features = np.float32(thumbnail)
+        if cache_path is not None:
+            save_features(cache_path, features)
+        return features
+
+
+class TemplateMatcher(FeatureMatcher):
+
+    def __init__(self,
+                 cell_size: Tuple[int, Optional[int]],
+                 scales: Tuple[float, ...] = (1.0, 0.95, 0.9, 0.85, 0.8),
+                 threshold: float = 0.8,
+                 ):
+        super().__init__(cell_size=cell_size)
+        self.scales = tuple(scales)
+        self.threshold = threshold
+        self._spectra = {}
+        self._norms = {}
+
+    @property
+    def params(self) -> dict:
+        return dict(super().params, cell_size=tuple(self.cell_size), scales=self.scales, threshold=self.threshold)
+
+    def _template_sizes(self,
+                        src_shape: Tuple[int, int, int],
+                        window: Tuple[int, int],
+                        ) -> List[Tuple[int, int]]:
+        h, w, *_ = src_shape
+        cell_w, cell_h = self.cell_size
+        fits = [cell_w / w] + ([cell_h / h] if cell_h else [])
+        # 边缘的照片单元可能比中位尺寸小一两个像素，超出搜索范围的模板等比缩小到刚好放下，而不是跳过
+        window_w, window_h = window
+        sizes = set()
+        for f in fits:
+            for s in self.scales:
+                tw, th = w * f * s, h * f * s
+                clamp = min(1.0, window_w / tw, window_h / th)
+                sizes.add((min(window_w, round(tw * clamp)), min(window_h, round(th * clamp))))
+        return sorted((tw, th) for tw, th in sizes if min(tw, th) >= MIN_TEMPLATE_SIZE)
+
+    def _get_spectrum(self, image: np.ndarray) -> np.ndarray:
+        # 同一张 IFS 图像只做一次正向 DFT，所有 Portal 和尺度共用
+        key = id(image)
+        if key not in self._spectra:
+            h, w = image.shape
+            padded = np.zeros((cv.getOptimalDFTSize(h), cv.getOptimalDFTSize(w)), np.float32)
+            padded[:h, :w] = image
+            self._spectra[key] = (image, cv.dft(padded))
+        return self._spectra[key][1]
+
+    def _get_norm(self, image: np.ndarray, th: int, tw: int) -> np.ndarray:
+        # 各窗口的标准差只与 IFS 图像和模板尺寸有关，按尺寸缓存
+        key = (id(image), th, tw)
+        if key not in self._norms:
+            s, sq = cv.integral2(image, sdepth=cv.CV_64F, sqdepth=cv.CV_64F)
+
+            def window(ii: np.ndarray) -> np.ndarray:
+                return ii[th:, tw:] - ii[:-th, tw:] - ii[th:, :-tw] + ii[:-th, :-tw]
+
+            n = th * tw
+            s1 = window(s)
+            std = np.sqrt(np.maximum(window(sq) - s1 * s1 / n, 0))
+            self._norms[key] = (image, np.float32(np.where(std > 1e-3 * np.sqrt(n), 1 / np.maximum(std, 1e-12), 0)))
+        return self._norms[key][1]
+
+    def _correlate(self, image: np.ndarray, template: np.ndarray) -> np.ndarray:
+        h, w = image.shape
+        th, tw = template.shape
+        if (h - th + 1) * (w - tw + 1) <= DIRECT_LIMIT:
+            return cv.matchTemplate(image, template, cv.TM_CCOEFF_NORMED)
+        spectrum = self._get_spectrum(image)
+        centered = template - template.mean()
+        norm = np.sqrt(np.square(centered).sum())
+        if norm < 1e-6:
+            return np.zeros((h - th + 1, w - tw + 1), np.float32)
+        padded = np.zeros(spectrum.shape, np.float32)
+        padded[:th, :tw] = centered / norm
+        corr = cv.idft(
+            cv.mulSpectrums(spectrum, cv.dft(padded, nonzeroRows=th), 0, conjB=True),
+            flags=cv.DFT_REAL_OUTPUT | cv.DFT_SCALE,
+        )[:h - th + 1, :w - tw + 1]
+        return cv.multiply(corr, self._get_norm(image, th, tw))
+
+    def _find_peaks(self, ncc: np.ndarray, tw: int, th: int) -> List[Tuple[float, int, int, int, int]]:
+        peaks = []
+        for _ in range(MAX_PEAKS):
+            _, score, _, (x, y) = cv.minMaxLoc(ncc)
+            if score < self.threshold:
+                break
+            peaks.append((score, x, y, tw, th))
+            ncc[max(0, y - th // 2):y + th // 2 + 1, max(0, x - tw // 2):x + tw // 2 + 1] = -1
+        return peaks
+
+    @staticmethod
+    def _overlap(a: Tuple[float, int, int, int, int], b: Tuple[float, int, int, int, int]) -> float:
+        _, ax, ay, aw, ah = a
+        _, bx, by, bw, bh = b
+        inter = max(0, min(ax + aw, bx + bw) - max(ax, bx)) * max(0, min(ay + ah, by + bh) - max(ay, by))
+        return inter / (aw * ah + bw * bh - inter)
+
+    def match_contours(self,
+                       src_shape: Tuple[int, int, int],
+                       src_features: FeaturesType,
+                       dst_features: FeaturesType,
+                       ) -> Tuple[List[np.ndarray], int]:
+        image, (ox, oy) = dst_features
+        h, w = image.shape
+        peaks = []
+        for tw, th in self._template_sizes(src_shape, (w, h)):
+            template = cv.resize(src_features, (tw, th), interpolation=cv.INTER_AREA)
+            peaks += self._find_peaks(self._correlate(image, template), tw, th)
+        kept = []
+        for peak in sorted(peaks, reverse=True):
+            if all(self._overlap(peak, k) < NMS_OVERLAP for k in kept):
+                kept.append(peak)
+        contours = [
+            np.int32([[x, y], [x, y + th - 1], [x + tw - 1, y + th - 1], [x + tw - 1, y]]).reshape(-1, 1, 2)
+            + (ox, oy) for _, x, y, tw, th in kept
+        ]
+        return contours, len(peaks)
@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+import numpy as np
+
+KEYPOINT_BYTES = 64
+
+
+def estimate_nbytes(entry: Tuple[Any, tuple]) -> int:
+    features, _ = entry
+    if isinstance(features, tuple):
+        kp, des = features
+        return len(kp) * KEYPOINT_BYTES + (des.nbytes if isinstance(des, np.ndarray) else 0)
+    return features.nbytes if isinstance(features, np.ndarray) else 0
+
+
+class FeatureMemoryCache:
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key: Hashable, entry: Tuple[Any, tuple]):
+        nbytes = estimate_nbytes(entry)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (entry, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
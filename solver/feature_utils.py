@@ -6,15 +6,15 @@ import numpy as np
 from .types import PathType
 
 
-def pack_features(keypoints: List[cv.KeyPoint], descriptors: np.ndarray) -> np.ndarray:
+def pack_features(keypoints: List[cv.KeyPoint], descriptors: np.ndarray, dtype: type = np.float64) -> np.ndarray:
     kp = np.array([
         (kp.pt[0], kp.pt[1], kp.angle, kp.class_id, kp.octave, kp.response, kp.size) for kp in keypoints
     ])
     des = np.array(descriptors)
-    return np.hstack((kp, des))
+    return np.hstack((kp, des)).astype(dtype, copy=False)
 
 
-def unpack_features(array: np.ndarray) -> Tuple[List[cv.KeyPoint], np.ndarray]:
+def unpack_features(array: np.ndarray, dtype: type = np.float32) -> Tuple[List[cv.KeyPoint], np.ndarray]:
     kp = array[:, :7]
     des = array[:, 7:]
     keypoints = [
@@ -22,13 +22,21 @@ def unpack_features(array: np.ndarray) -> Tuple[List[cv.KeyPoint], np.ndarray]:
             x=x, y=y, angle=angle, class_id=int(class_id), octave=int(octave), response=response, size=size
         ) for x, y, angle, class_id, octave, response, size in kp
     ]
-    descriptors = np.array(des).astype(np.float32)
+    descriptors = np.array(des).astype(dtype)
     return keypoints, descriptors
 
 
-def save_features(filename: PathType, array: Union[np.ndarray, np.recarray]):
-    np.save(str(filename), array)
+def save_features(filename: PathType, array: Union[np.ndarray, np.recarray], descriptor_dtype: type = None):
+    if descriptor_dtype is None:
+        np.save(str(filename), array)
+        return
+    # 描述子按压缩后的存储类型单独保存，关键点仍为 float32
+    np.savez(str(filename), keypoints=np.float32(array[:, :7]), descriptors=array[:, 7:].astype(descriptor_dtype))
 
 
 def load_features(filename: PathType) -> Union[np.ndarray, np.recarray]:
-    return np.load(str(filename))
+    data = np.load(str(filename))
+    if not isinstance(data, np.lib.npyio.NpzFile):
+        return data
+    with data:
+        return np.hstack((data['keypoints'], np.float32(data['descriptors'])))
@@ -0,0 +1,104 @@
+import asyncio
+import csv
+import logging
+import sys
+from functools import partial
+from typing import List, Union
+
+from .catalog import PortalCatalog
+from .config import ConfigProxy
+from .metadata import FIELD_NAMES, save_portals_as_csv, read_portals_from_csv
+from .types import PathType
+
+
+async def run_in_executor(func):
+    if sys.version_info >= (3, 9):
+        return await asyncio.to_thread(func)
+    else:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, func)
+
+
+class PortalFetcher:
+    # 只负责下载阶段，不依赖 cv2/numpy，单独下载时无需加载匹配相关模块
+
+    def __init__(self,
+                 config: ConfigProxy,
+                 no_clean: bool = False,
+                 metadata_csv: PathType = None,
+                 ):
+        self.config = config
+        self.no_clean = no_clean
+        self.metadata_csv = metadata_csv or config.metadata_csv
+        self.catalog = PortalCatalog(config.catalog_db)
+        self._downloader = None
+
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def downloader(self):
+        if self._downloader is None:
+            from .intel_map import PortalDownloader
+            self._downloader = PortalDownloader(
+                image_dir=self.config.portal_images_dir,
+                proxy_url=self.config.proxy,
+                no_clean=self.no_clean,
+                catalog=self.catalog,
+                **self.config.download,
+            )
+        return self._downloader
+
+    async def download_csv(self):
+        portals = await self.downloader.iter_portals_by_square(
+            self.config.cookies,
+            self.config.lat,
+            self.config.lng,
+            self.config.radius
+        )
+        await run_in_executor(partial(save_portals_as_csv, self.config.metadata_csv, portals))
+        portals_list = await run_in_executor(partial(read_portals_from_csv, self.config.metadata_csv))
+        self.catalog.update_portals(portals_list)
+
+    async def download_images(self):
+        portals_list = await run_in_executor(partial(read_portals_from_csv, self.metadata_csv))
+        self.catalog.update_portals(portals_list)
+        ok, err = await self.downloader.download_portals_by_list(portals_list)
+        await self._save_download_errors(portals_list, ok, err)
+
+    async def download_all(self):
+        if self.metadata_csv != self.config.metadata_csv:
+            await self.download_csv()
+            await self.download_images()
+            return
+        portals_queue = asyncio.Queue()
+        download = asyncio.create_task(self.downloader.download_portals_from_queue(portals_queue))
+        portals_list = []
+        try:
+            with open(self.config.metadata_csv, 'w', newline='', encoding='utf-8') as f:
+                f_csv = csv.writer(f)
+                f_csv.writerow(FIELD_NAMES)
+                async for portal in self.downloader.stream_portals_by_square(
+                        self.config.cookies,
+                        self.config.lat,
+                        self.config.lng,
+                        self.config.radius
+                ):
+                    row = (portal.title, portal.lat, portal.lng, portal.image)
+                    f_csv.writerow(row)
+                    p = dict(zip(FIELD_NAMES, map(str, row)))
+                    # 先写入 catalog 再交给下载任务，否则下载先建立的记录只有文件名
+                    self.catalog.update_portals([p])
+                    portals_queue.put_nowait((len(portals_list), p))
+                    portals_list.append(p)
+        finally:
+            portals_queue.put_nowait(None)
+        ok, err = await download
+        await self._save_download_errors(portals_list, ok, err)
+
+    async def _save_download_errors(self, portals_list: List[dict], ok: bool, err: Union[list, None]):
+        if not ok:
+            import aiofiles
+            self.logger.warning(f'有{len(err)}个图像下载失败，可以尝试使用 --no-clean 参数下载失败部分')
+            async with aiofiles.open(self.config.download_errors_txt, 'w', encoding='utf-8') as f:
+                await f.writelines(f"{n}, {portals_list[n]['Name']}, \"{e}\"\n" for n, e in err)
+            self.logger.warning(f'下载错误已保存在 {str(self.config.download_errors_txt)}')
@@ -1,24 +1,29 @@
 import asyncio
-import csv
 import logging
 import sys
+import time
+from importlib.util import find_spec
 from pathlib import Path
-from typing import List, Tuple, Union, Iterator
+from typing import Tuple, Union, Iterator, AsyncIterator, Awaitable, Callable, Optional
 
 import aiofiles
 import httpx
 from httpx_socks import AsyncProxyTransport
 from IntelMapClient import AsyncClient, AsyncAPI
 from IntelMapClient.client import DEFAULT_HEADERS
-from IntelMapClient.types import MapTiles, Portal
+from IntelMapClient.types import MapTiles, Portal, Tile
 from tqdm.asyncio import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
+from .catalog import PortalCatalog
+from .throttle import AdaptiveLimiter
 from .types import PathType
 from .utils import parse_portal_filename
 
-FIELD_NAMES = ['Name', 'Latitude', 'Longitude', 'Image']
 MAX_WORKERS = 10
+MIN_DOWNLOAD_WORKERS = 2
+MAX_DOWNLOAD_WORKERS = 32
+KEEPALIVE_EXPIRY = 30
 
 
 class PortalDownloader:
@@ -27,14 +32,24 @@ class PortalDownloader:
                  image_dir: PathType,
                  proxy_url: str = None,
                  no_clean: bool = True,
-                 max_workers: int = MAX_WORKERS
+                 max_workers: int = MAX_WORKERS,
+                 catalog: PortalCatalog = None,
+                 min_download_workers: int = MIN_DOWNLOAD_WORKERS,
+                 max_download_workers: int = MAX_DOWNLOAD_WORKERS,
+                 http2: bool = False,
                  ):
         self.image_dir = Path(image_dir)
         self.proxy_url = proxy_url
         self.no_clean = no_clean
         self.max_workers = max_workers
+        self.catalog = catalog
+        self.min_download_workers = min_download_workers
+        self.max_download_workers = max_download_workers
 
         self.logger = logging.getLogger(__name__)
+        self.http2 = http2 and find_spec('h2') is not None
+        if http2 and not self.http2:
+            self.logger.warning('未安装 h2，HTTP/2 未启用，可通过 pip install httpx[http2] 安装')
 
     async def iter_portals_by_square(self,
                                      cookies: str,
@@ -56,6 +71,45 @@ class PortalDownloader:
             tile_set = await AsyncAPI(client).GetEntitiesByMapTiles(map_tiles)
             return tile_set.portals()
 
+    async def stream_portals_by_square(self,
+                                       cookies: str,
+                                       center_lat: float,
+                                       center_lng: float,
+                                       radian_meter: int,
+                                       chunk_size: int = 5,
+                                       max_retries: int = 5,
+                                       ) -> AsyncIterator[Portal]:
+        map_tiles = MapTiles.from_square(
+            center_lat=center_lat,
+            center_lng=center_lng,
+            radian_meter=radian_meter,
+            zoom=15,
+        )
+        async with AsyncClient(cookies, self.proxy_url) as client:
+            client.set_workers(self.max_workers)
+            if not await client.authorize():
+                self.logger.error('Cookies 验证失败')
+                sys.exit(0)
+            wait_list = map_tiles.tileKeys()
+            for _ in range(max_retries):
+                if not wait_list:
+                    break
+                tasks = [
+                    asyncio.create_task(client.getEntities(wait_list[i: i + chunk_size]))
+                    for i in range(0, len(wait_list), chunk_size)
+                ]
+                wait_list = []
+                for task in asyncio.as_completed(tasks):
+                    resp = await task
+                    for name, ents in resp.data['map'].items():
+                        if 'gameEntities' in ents:
+                            for portal in Tile.parse(name, ents).portals:
+                                yield portal
+                        else:
+                            wait_list.append(name)
+            if any(wait_list):
+                self.logger.warning(f'有 {len(wait_list)} 个地图区块获取失败')
+
     async def _save_image(self,
                           image: bytes,
                           image_name,
@@ -64,65 +118,125 @@ class PortalDownloader:
             await f.write(image)
 
     async def _fetch_image(self,
-                           semaphore: asyncio.Semaphore,
+                           limiter: AdaptiveLimiter,
                            client: httpx.AsyncClient,
                            url: str,
                            filename: PathType,
                            num: int,
                            ) -> Tuple[int, Union[str, Exception, None]]:
-        async with semaphore:
-            if not url.startswith('http'):
-                return num, 'Not URL'
+        if not url.startswith('http'):
+            self._mark_error(filename, 'Not URL')
+            return num, 'Not URL'
+        async with limiter:
+            start = time.perf_counter()
             try:
                 resp = await client.get(url)
-                await self._save_image(resp.content, filename)
+                resp.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                limiter.record(time.perf_counter() - start, False, congested=status == 429 or status >= 500)
+                self._mark_error(filename, repr(e))
+                return num, e
             except Exception as e:
+                limiter.record(time.perf_counter() - start, False)
+                self._mark_error(filename, repr(e))
                 return num, e
-            return num, None
+            limiter.record(time.perf_counter() - start, True, len(resp.content))
+        try:
+            await self._save_image(resp.content, filename)
+        except Exception as e:
+            self._mark_error(filename, repr(e))
+            return num, e
+        if self.catalog is not None:
+            self.catalog.mark_downloaded(str(filename), PortalCatalog.get_content_hash(resp.content))
+        return num, None
+
+    def _mark_error(self, filename: PathType, error: str):
+        if self.catalog is not None:
+            self.catalog.mark_error(str(filename), error)
+
+    def _is_downloaded(self, filename: str, downloaded: set) -> bool:
+        image_path = self.image_dir.joinpath(filename)
+        if self.catalog is None:
+            return image_path.exists()
+        return self.catalog.is_downloaded(image_path, downloaded)
+
+    def _create_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=self.max_download_workers,
+            max_keepalive_connections=self.max_download_workers,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            transport=httpx.AsyncHTTPTransport(retries=1, limits=limits, http2=self.http2)
+            if self.proxy_url is None else
+            AsyncProxyTransport.from_url(self.proxy_url, retries=1, limits=limits, http2=self.http2),
+            timeout=httpx.Timeout(15),
+        )
+
+    async def _download(self, next_item: Callable[[], Awaitable[Optional[tuple]]], pbar: tqdm) -> list:
+        limiter = AdaptiveLimiter(self.min_download_workers, self.max_download_workers, self.max_workers)
+        downloaded = self.catalog.downloaded_filenames() if self.no_clean and self.catalog is not None else set()
+        errors_list = []
+        async with self._create_client() as client:
+            async def worker():
+                while True:
+                    item = await next_item()
+                    if item is None:
+                        return
+                    num, p = item
+                    filename = parse_portal_filename(p['Image'], p['Latitude'], p['Longitude'])
+                    if not (self.no_clean and self._is_downloaded(filename, downloaded)):
+                        downloaded.add(filename)
+                        num, error = await self._fetch_image(limiter, client, p['Image'], filename, num)
+                        if error is not None:
+                            errors_list.append((num, error))
+                    pbar.set_postfix_str(f'并发 {int(limiter.limit)}', refresh=False)
+                    pbar.update()
+
+            await asyncio.gather(*(worker() for _ in range(limiter.max_limit)))
+        self._report(limiter)
+        return errors_list
+
+    def _report(self, limiter: AdaptiveLimiter):
+        stats = limiter.summary()
+        if stats['count'] == 0 and stats['errors'] == 0:
+            return
+        self.logger.info(
+            f"下载 {stats['count']} 张, 失败 {stats['errors']} 张, 用时 {stats['elapsed']:.1f} 秒, "
+            f"{stats['rate']:.2f} 张/秒, {stats['mbps']:.2f} MB/秒"
+        )
+        self.logger.info(
+            f"延迟 p50 {stats['p50']:.2f} 秒, p95 {stats['p95']:.2f} 秒, "
+            f"并发 最终 {stats['limit']} / 峰值 {stats['peak']}"
+        )
+
+    async def download_portals_from_queue(self, portals_queue: asyncio.Queue) -> Tuple[bool, Union[list, None]]:
+        with logging_redirect_tqdm(), tqdm(total=0) as pbar:
+            async def next_item():
+                item = await portals_queue.get()
+                if item is None:
+                    portals_queue.put_nowait(None)
+                else:
+                    pbar.total += 1
+                    pbar.refresh()
+                return item
+
+            errors_list = await self._download(next_item, pbar)
+        if any(errors_list):
+            return False, errors_list
+        else:
+            return True, None
 
     async def download_portals_by_list(self, portals_list: list) -> Tuple[bool, Union[list, None]]:
-        semaphore = asyncio.Semaphore(self.max_workers)
-        async with httpx.AsyncClient(
-                headers=DEFAULT_HEADERS,
-                transport=httpx.AsyncHTTPTransport(retries=1) if self.proxy_url is None else
-                AsyncProxyTransport.from_url(self.proxy_url, retries=1),
-                timeout=httpx.Timeout(15),
-        ) as client:
-            tasks = []
-            for num, p in enumerate(portals_list):
-                filename = parse_portal_filename(p['Image'], p['Latitude'], p['Longitude'])
-                if self.no_clean and self.image_dir.joinpath(filename).exists():
-                    continue
-                tasks.append(
-                    asyncio.create_task(self._fetch_image(
-                        semaphore=semaphore,
-                        client=client,
-                        url=p['Image'],
-                        filename=filename,
-                        num=num,
-                    )
-                ))
-            errors_list = []
-            with logging_redirect_tqdm():
-                for task in tqdm.as_completed(tasks):
-                    num, error = await task
-                    if error is not None:
-                        errors_list.append((num, error))
-            if any(errors_list):
-                return False, errors_list
-            else:
-                return True, None
-
-    @staticmethod
-    def save_portals_as_csv(filename: PathType, portals: Iterator[Portal]) -> None:
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            f_csv = csv.writer(f)
-            f_csv.writerow(FIELD_NAMES)
-            f_csv.writerows(((p.title, p.lat, p.lng, p.image) for p in portals))
-
-    @staticmethod
-    def read_portals_from_csv(filename: PathType) -> List[dict]:
-        with open(filename, 'r', newline='', encoding='utf-8', errors="replace") as f:
-            f_csv = csv.DictReader(f, fieldnames=FIELD_NAMES)
-            _ = next(f_csv)
-            return list(f_csv)  # type: ignore
+        portals = enumerate(portals_list)
+        with logging_redirect_tqdm(), tqdm(total=len(portals_list)) as pbar:
+            async def next_item():
+                return next(portals, None)
+
+            errors_list = await self._download(next_item, pbar)
+        if any(errors_list):
+            return False, errors_list
+        else:
+            return True, None
@@ -0,0 +1,20 @@
+import csv
+from typing import Iterable, List
+
+from .types import PathType
+
+FIELD_NAMES = ['Name', 'Latitude', 'Longitude', 'Image']
+
+
+def save_portals_as_csv(filename: PathType, portals: Iterable) -> None:
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        f_csv = csv.writer(f)
+        f_csv.writerow(FIELD_NAMES)
+        f_csv.writerows(((p.title, p.lat, p.lng, p.image) for p in portals))
+
+
+def read_portals_from_csv(filename: PathType) -> List[dict]:
+    with open(filename, 'r', newline='', encoding='utf-8', errors="replace") as f:
+        f_csv = csv.DictReader(f, fieldnames=FIELD_NAMES)
+        _ = next(f_csv)
+        return list(f_csv)  # type: ignore
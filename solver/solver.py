@@ -1,40 +1,41 @@
-import asyncio
 import csv
+import hashlib
 import logging
 import sys
+from contextlib import closing
 from functools import partial
 from itertools import groupby, islice
 from operator import itemgetter
-from typing import Callable, Tuple, List, Iterator
+from pathlib import Path
+from typing import Callable, Tuple, List, Iterator, Union
 
-import aiofiles
 import cv2 as cv
 import numpy as np
 from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
 from .config import ConfigProxy
-from .draw_utils import get_picture_max_border, get_cnt_center, get_passcode
-from .intel_map import PortalDownloader
+from .cells import CellSet
+from .feature_cache import FeatureMemoryCache
+from .feature_utils import load_features
+from .fetcher import PortalFetcher
+from .distributed import Coordinator, Worker
+from .draw_utils import get_foreground_contours, get_contours_max_border, get_picture_cells, get_cnt_center, \
+    get_passcode
 from .grid_utils import sort_grid
-from .types import PathType
+from .metadata import read_portals_from_csv
+from .types import PathType, FeaturesType
 from .utils import parse_cache_path, parse_portal_filename
 from .state import MatchState
 
-from .extensions.base import FeatureExtractor
+from .extensions.base import FeatureExtractor, FeatureMatcher
+from .extensions.compress import DescriptorCompressor
+from .extensions.scheduler import DeviceScheduler
 
 MAX_WORKERS = 8
 
 
-async def run_in_executor(func):
-    if sys.version_info >= (3, 9):
-        return await asyncio.to_thread(func)
-    else:
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, func)
-
-
-class Solver:
+class Solver(PortalFetcher):
 
     def __init__(self,
                  config: ConfigProxy,
@@ -42,15 +43,8 @@ class Solver:
                  save_progress: bool = True,
                  metadata_csv: PathType = None,
                  ):
-        self.config = config
-        self.no_clean = no_clean
+        super().__init__(config, no_clean, metadata_csv)
         self.save_progress = save_progress
-        self.metadata_csv = metadata_csv or config.metadata_csv
-        self._downloader = PortalDownloader(
-            image_dir=config.portal_images_dir,
-            proxy_url=config.proxy,
-            no_clean=no_clean,
-        )
 
         self.match_state = MatchState(
             state_path=self.config.match_progress_pkl,
@@ -58,71 +52,181 @@ class Solver:
             save_progress=save_progress,
         )
 
+        self.feature_cache: Union[FeatureMemoryCache, None] = None
+        self._resident = {}
+
         self.logger = logging.getLogger(__name__)
 
-    async def download_csv(self):
-        portals = await self._downloader.iter_portals_by_square(
-            self.config.cookies,
-            self.config.lat,
-            self.config.lng,
-            self.config.radius
-        )
-        await run_in_executor(partial(self._downloader.save_portals_as_csv, self.config.metadata_csv, portals))
-
-    async def download_images(self):
-        portals_list = await run_in_executor(partial(self._downloader.read_portals_from_csv, self.metadata_csv))
-        ok, err = await self._downloader.download_portals_by_list(portals_list)
-        if not ok:
-            self.logger.warning(f'有{len(err)}个图像下载失败，可以尝试使用 --no-clean 参数下载失败部分')
-            async with aiofiles.open(self.config.download_errors_txt, 'w', encoding='utf-8') as f:
-                await f.writelines(f"{n}, {portals_list[n]['Name']}, \"{e}\"\n" for n, e in err)
-            self.logger.warning(f'下载错误已保存在 {str(self.config.download_errors_txt)}')
-
-    def _get_ifs_image_crop_path(self):
-        x, y = get_picture_max_border(self.config.ifs_image_path)
+    def _get_ifs_image_crop(self) -> Tuple[PathType, np.ndarray, list]:
         ifs_image = cv.imread(str(self.config.ifs_image_path))
-        ifs_image_crop = ifs_image[0:y, 0:x]
+        contours = get_foreground_contours(ifs_image)
+        x, y = get_contours_max_border(contours)
+        ifs_image_crop = ifs_image[0:y + 1, 0:x + 1]
         ifs_image_crop_path = self.config.output_sub_dir \
             .joinpath(f'{str(self.config.ifs_image_path.stem)}_{x}_{y}{self.config.ifs_image_path.suffix}')
         cv.imwrite(str(ifs_image_crop_path), ifs_image_crop)
-        return ifs_image_crop_path
+        return ifs_image_crop_path, ifs_image_crop, get_picture_cells(contours)
+
+    def _get_ifs_target(self,
+                        extractor: FeatureExtractor,
+                        ifs_image_path: PathType,
+                        ifs_image: np.ndarray,
+                        cells: list,
+                        cell_set: CellSet = None,
+                        ) -> Union[CellSet, FeaturesType]:
+        if not self.config.segment or len(cells) < 2:
+            return extractor.get_image_features(ifs_image_path)
+        height, width, *_ = ifs_image.shape
+        boxes = [(x, y, min(w, width - x), min(h, height - y)) for (x, y, w, h), _ in cells]
+        features = extractor.get_cells_features(cv.cvtColor(ifs_image, cv.COLOR_BGR2GRAY), boxes, MAX_WORKERS)
+        if cell_set is not None:
+            return cell_set.with_features(features)
+        cell_set = CellSet(boxes, [c for _, c in cells], features)
+        cell_set.restore(cnt for _, cnt in self.match_state.match_cnts)
+        self.logger.info(f'IFS 图像共分割出 {len(cell_set)} 个照片单元')
+        return cell_set
+
+    @staticmethod
+    def _get_ifs_digest(ifs_image: np.ndarray, ifs_target: Union[CellSet, FeaturesType]) -> str:
+        boxes = ifs_target.boxes if isinstance(ifs_target, CellSet) else None
+        return hashlib.md5(ifs_image.tobytes() + repr((ifs_image.shape, boxes)).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _get_match_key(extractor: FeatureExtractor, matcher: FeatureMatcher, ifs_digest: str) -> str:
+        params = (ifs_digest, extractor.method, type(matcher).__name__, sorted(matcher.params.items()))
+        return hashlib.md5(repr(params).encode('utf-8')).hexdigest()
+
+    def _get_matcher_func(self,
+                          extractor: FeatureExtractor,
+                          matcher: FeatureMatcher,
+                          ifs_target: Union[CellSet, FeaturesType],
+                          ifs_digest: str,
+                          ) -> Callable:
+        return partial(self._match_with_cache, self._get_match_key(extractor, matcher, ifs_digest), matcher, ifs_target)
+
+    def _match_with_cache(self,
+                          match_key: str,
+                          matcher: FeatureMatcher,
+                          ifs_target: Union[CellSet, FeaturesType],
+                          content_hash: Union[str, None],
+                          load_portal_features: Callable[[], Tuple[FeaturesType, Tuple[int, int, int]]],
+                          ) -> List[np.ndarray]:
+        cached = self.catalog.get_match(content_hash, match_key) \
+            if self.no_clean and content_hash is not None else None
+        matches = [] if cached is None else [(index, np.array(cnt, dtype=np.int32)) for index, cnt in cached[0]]
+        if not isinstance(ifs_target, CellSet):
+            if cached is None:
+                features, shape = load_portal_features()
+                matches = [(None, cnt) for cnt in matcher.get_match_contours(shape, features, ifs_target)]
+                self._save_match(content_hash, match_key, matches)
+            return [cnt for _, cnt in matches]
+
+        # 只计算缓存中尚未检查过的照片单元，已检查过的直接复用结果
+        pending = ifs_target.pending
+        checked = set(cached[1] or []) if cached is not None else set()
+        missing = [index for index in pending if index not in checked]
+        if missing:
+            features, shape = load_portal_features()
+            matches += ifs_target.match_cells(matcher.get_cells_match_contours, shape, features, missing)
+            self._save_match(content_hash, match_key, matches, sorted(checked.union(missing)))
+        pending = set(pending)
+        return ifs_target.accept_cells(sorted((m for m in matches if m[0] in pending), key=itemgetter(0)))
+
+    def _save_match(self,
+                    content_hash: Union[str, None],
+                    match_key: str,
+                    matches: List[Tuple[Union[int, None], np.ndarray]],
+                    cells: List[int] = None,
+                    ):
+        if content_hash is not None:
+            self.catalog.save_match(content_hash, match_key, [(index, cnt.tolist()) for index, cnt in matches], cells)
 
     def _get_match(self,
                    extractor: FeatureExtractor,
                    portal_image_path: PathType,
                    matcher_func: Callable,
                    ) -> List[np.ndarray]:
-        features, shape = extractor.get_features_and_shape(
-            portal_image_path,
-            parse_cache_path(self.config.portal_features_dir, extractor.method, portal_image_path),
-        )
-        match = matcher_func(src_features=features, src_shape=shape)
-        return match
+        filename = Path(portal_image_path).name
+        cache_path = parse_cache_path(
+            self.config.portal_features_dir, extractor.method, portal_image_path, extractor.cache_suffix)
+        content_hash = self.catalog.content_hash(filename)
+        cached = self.catalog.get_feature(filename, extractor.method)
+        if cached is not None and (cached[1] != content_hash or cached[0] != cache_path):
+            self.logger.debug(f'Portal 照片已更新，重新计算特征: {filename}')
+            cached[0].unlink(missing_ok=True)
+            cached = None
+
+        def load_portal_features() -> Tuple[FeaturesType, Tuple[int, int, int]]:
+            key = (extractor.method, filename, content_hash)
+            entry = self.feature_cache.get(key) if self.feature_cache is not None else None
+            if entry is None:
+                entry = extractor.get_features_and_shape(portal_image_path, cache_path)
+                if entry[0] is None or entry[1] is None:
+                    raise FileNotFoundError(str(portal_image_path))
+                if self.feature_cache is not None:
+                    self.feature_cache.put(key, entry)
+            if cached is None:
+                self.catalog.save_feature(filename, extractor.method, cache_path, content_hash)
+            return entry
+
+        return matcher_func(content_hash=content_hash, load_portal_features=load_portal_features)
+
+    def _match_portal(self,
+                      extractor: FeatureExtractor,
+                      matcher_func: Callable,
+                      downloaded: set,
+                      job: Tuple[int, dict],
+                      ) -> Union[List[np.ndarray], None]:
+        num, p = job
+        self.logger.info(f'正在匹配 {num+1} {p["Name"]}')
+        portal_image_path = self.config.portal_images_dir.joinpath(
+            parse_portal_filename(p['Image'], p['Latitude'], p['Longitude']))
+        if not self.catalog.is_downloaded(portal_image_path, downloaded):
+            self.logger.debug(f"Portal 照片不存在: ({num}) {p['Name']}")
+            return None
+        try:
+            return self._get_match(extractor, portal_image_path, matcher_func)
+        except FileNotFoundError:
+            # 照片目录被清理而 catalog.db 仍保留时，索引中的记录已失效，下次下载时重新获取
+            self.logger.debug(f"Portal 照片已被删除: ({num}) {p['Name']}")
+            self.catalog.mark_missing(portal_image_path.name)
+            return None
 
     def get_matches(self,
                      portals: List[dict],
                      extractor: FeatureExtractor,
                      matcher_func: Callable,
                      start: int = 0,
+                     is_done: Callable[[], bool] = None,
+                     scheduler: Union[DeviceScheduler, Coordinator] = None,
                      ) -> List[Tuple[int, np.ndarray]]:
         errors_list = []
-        with logging_redirect_tqdm(), self.match_state:
-            for num, p in enumerate(tqdm(portals[start:])):
-                num += start
-                self.logger.info(f'正在匹配 {num+1} {p["Name"]}')
-                portal_image_path = self.config.portal_images_dir.joinpath(
-                    parse_portal_filename(p['Image'], p['Latitude'], p['Longitude']))
-                if not portal_image_path.exists():
-                    self.logger.debug(f"Portal 照片不存在: ({num}) {p['Name']}")
+        downloaded = self.catalog.downloaded_filenames()
+        jobs = list(islice(enumerate(portals), start, None)) if is_done is None or not is_done() else []
+        if scheduler is None:
+            match_portal = partial(self._match_portal, extractor, matcher_func, downloaded)
+            results = ((job, match_portal(job)) for job in jobs)
+        else:
+            results = scheduler.map(jobs)
+        completed = set()
+        with logging_redirect_tqdm(), self.match_state, closing(results):
+            for (num, p), cnts in tqdm(results, total=len(jobs)):
+                if cnts is None:
                     errors_list.append((num, 'Not Found'))
                 else:
-                    self.match_state.save_index(num)
-                    for cnt in self._get_match(extractor, portal_image_path, matcher_func):
+                    for cnt in cnts:
                         self.match_state.save_cnt(num, cnt)
+                completed.add(num)
+                while start in completed:
+                    start += 1
+                self.match_state.save_index(start)
+                if is_done is not None and is_done():
+                    self.logger.info('所有照片单元均已匹配，提前结束')
+                    break
 
         if any(errors_list):
             with open(self.config.split_errors_txt, 'w', encoding='utf-8') as f:
-                f.writelines(f"{n}, {portals[n]['Name']}, \"{e}\"\n" for n, e in errors_list)
+                f.writelines(f"{n}, {portals[n]['Name']}, \"{e}\"\n" for n, e in sorted(errors_list))
             self.logger.warning(
                 f'有 {len(errors_list)} 张 Portal 照片无法计算，请查看 {str(self.config.split_errors_txt)}')
 
@@ -149,37 +253,141 @@ class Solver:
     def _check_cache_dir(self, method: str):
         self.config.portal_features_dir.joinpath(method).mkdir(exist_ok=True)
 
-    async def split_picture(self, method: str):
+    def _get_compressor(self, ifs_image_path: PathType) -> DescriptorCompressor:
+        compressor = DescriptorCompressor(**self.config.descriptor)
+        if not compressor.needs_fit:
+            return compressor
+        compressor_path = self.config.portal_features_dir.joinpath(f'{compressor.name}.npz')
+        if self.no_clean and compressor_path.exists():
+            compressor.load(compressor_path)
+            return compressor
+        from solver.extensions.sift_opencv import SiftExtractor
+        extractor = SiftExtractor()
+        cache_paths = islice(self.config.portal_features_dir.joinpath(extractor.method).glob('*.npy'), 256)
+        descriptors = [load_features(path)[:, 7:] for path in cache_paths]
+        if not descriptors:
+            self.logger.info('没有已缓存的 Portal 特征，使用 IFS 图像学习描述子压缩参数')
+            descriptors = [extractor.get_image_features(ifs_image_path)[1]]
+        compressor.fit(descriptors)
+        compressor.save(compressor_path)
+        return compressor
+
+    def _create_scheduler(self,
+                          ifs_image_path: PathType,
+                          ifs_image: np.ndarray,
+                          cells: list,
+                          ifs_target: Union[CellSet, FeaturesType],
+                          ifs_digest: str,
+                          cell_size: Tuple[int, Union[int, None]],
+                          ) -> DeviceScheduler:
+        from solver.extensions.sift_silx import SiftExtractor, SiftMatcher
+        downloaded = self.catalog.downloaded_filenames()
+
+        def make_worker(device: dict) -> Callable:
+            extractor = SiftExtractor(**device, enable_cache=self.no_clean)
+            matcher = SiftMatcher(**device, **self.config.match, cell_size=cell_size)
+            matcher_func = self._get_matcher_func(extractor, matcher, ifs_target, ifs_digest)
+            return partial(self._match_portal, extractor, matcher_func, downloaded)
+
+        def make_fallback() -> Callable:
+            from solver.extensions.sift_opencv import SiftExtractor, BFMatcher
+            self.logger.info('使用 opencv 计算出错设备上的 Portal 图像')
+            extractor = SiftExtractor(enable_cache=self.no_clean)
+            self._check_cache_dir(extractor.method)
+            target = self._get_ifs_target(extractor, ifs_image_path, ifs_image, cells,
+                                          ifs_target if isinstance(ifs_target, CellSet) else None)
+            matcher = BFMatcher(**self.config.match, cell_size=cell_size)
+            matcher_func = self._get_matcher_func(extractor, matcher, target, ifs_digest)
+            return partial(self._match_portal, extractor, matcher_func, downloaded)
+
+        return DeviceScheduler(self.config.silx_devices, make_worker, make_fallback)
+
+    def _get_cell_size(self, ifs_image: np.ndarray, cells: list) -> Tuple[int, Union[int, None]]:
+        single = [box for box, capacity in cells if capacity == 1]
+        if len(single) < 2:
+            return round(ifs_image.shape[1] / self.config.column), None
+        widths, heights = zip(*((w, h) for _, _, w, h in single))
+        return int(np.median(widths)), int(np.median(heights))
+
+    def _create_backend(self,
+                        method: str,
+                        compressor: DescriptorCompressor = None,
+                        cell_size: Tuple[int, Union[int, None]] = None,
+                        ) -> Tuple[FeatureExtractor, FeatureMatcher]:
         if method == 'silx':
             from solver.extensions.sift_silx import SiftExtractor, SiftMatcher
-            extractor = SiftExtractor(**self.config.silx, enable_cache=self.no_clean)
-            matcher = SiftMatcher(**self.config.silx)
+            extractor = SiftExtractor(**self.config.silx_devices[0], enable_cache=self.no_clean)
+            matcher = SiftMatcher(**self.config.silx_devices[0], **self.config.match, cell_size=cell_size)
         elif method == 'opencv':
             from solver.extensions.sift_opencv import SiftExtractor, BFMatcher
-            extractor = SiftExtractor(enable_cache=self.no_clean)
-            matcher = BFMatcher()
+            extractor = SiftExtractor(enable_cache=self.no_clean, compressor=compressor)
+            matcher = BFMatcher(**self.config.match, cell_size=cell_size)
+        elif method == 'template':
+            from solver.extensions.template import TemplateExtractor, TemplateMatcher
+            extractor = TemplateExtractor(enable_cache=self.no_clean)
+            matcher = TemplateMatcher(cell_size, **self.config.template)
         else:
             self.logger.error(f'不支持使用 {method} 方法')
             sys.exit(0)
+        return extractor, matcher
 
-        self.logger.info('计算 IFS 图像')
-        ifs_image_path = self._get_ifs_image_crop_path()
-        ifs_image_features = extractor.get_image_features(ifs_image_path)
+    def _get_distributed_setup(self,
+                               method: str,
+                               extractor: FeatureExtractor,
+                               ifs_target: Union[CellSet, FeaturesType],
+                               ifs_digest: str,
+                               cell_size: Tuple[int, Union[int, None]],
+                               ) -> dict:
+        setup = dict(method=method, compressor=extractor.compressor, ifs_digest=ifs_digest, cell_size=cell_size)
+        if isinstance(ifs_target, CellSet):
+            setup.update(boxes=ifs_target.boxes, capacities=ifs_target.capacities,
+                         features=[extractor.to_pack(f) for f in ifs_target.features])
+        else:
+            setup.update(features=extractor.to_pack(ifs_target))
+        return setup
 
-        self._check_cache_dir(extractor.method)
+    def run_worker(self, address: Tuple[str, int]):
+        def make_worker(setup: dict) -> Tuple[Callable, Union[CellSet, None]]:
+            extractor, matcher = self._create_backend(setup['method'], setup['compressor'], setup['cell_size'])
+            self._check_cache_dir(extractor.method)
+            if 'boxes' in setup:
+                ifs_target = CellSet(setup['boxes'], setup['capacities'],
+                                     [extractor.from_pack(f) for f in setup['features']])
+            else:
+                ifs_target = extractor.from_pack(setup['features'])
+            matcher_func = self._get_matcher_func(extractor, matcher, ifs_target, setup['ifs_digest'])
+            match_portal = partial(self._match_portal, extractor, matcher_func, self.catalog.downloaded_filenames())
+            return match_portal, ifs_target if isinstance(ifs_target, CellSet) else None
 
-        self.logger.info('计算 Portal 图像')
-        portals = self._downloader.read_portals_from_csv(self.metadata_csv)
+        Worker(address, self.config.authkey, make_worker).run()
 
-        match_cnts = self.get_matches(
-            portals,
-            extractor,
-            partial(matcher.get_match_contours, dst_features=ifs_image_features),
-            self.match_state.index
-        )
+    def _prepare_split(self, method: str) -> tuple:
+        if method in self._resident:
+            prepared = self._resident[method]
+            ifs_target = prepared[2]
+            if isinstance(ifs_target, CellSet):
+                ifs_target.reset()
+                ifs_target.restore(cnt for _, cnt in self.match_state.match_cnts)
+            return prepared
+
+        self.logger.info('计算 IFS 图像')
+        ifs_image_path, ifs_image, cells = self._get_ifs_image_crop()
+
+        cell_size = self._get_cell_size(ifs_image, cells)
+        extractor, matcher = self._create_backend(
+            method, self._get_compressor(ifs_image_path) if method == 'opencv' else None, cell_size)
+        ifs_target = self._get_ifs_target(extractor, ifs_image_path, ifs_image, cells)
+
+        self._check_cache_dir(extractor.method)
+        prepared = self._resident[method] = \
+            (extractor, matcher, ifs_target, ifs_image_path, ifs_image, cells, cell_size)
+        return prepared
 
+    def _save_split_result(self, portals: List[dict], match_cnts: List[Tuple[int, np.ndarray]], ifs_image: np.ndarray):
+        if not match_cnts:
+            self.logger.warning('没有匹配到任何 Portal 照片，可以尝试调整 [match] 中的参数')
         centers = np.array([get_cnt_center(cnt[1]) for cnt in match_cnts])
-        grids = sort_grid(centers, self.config.column)
+        grids = sort_grid(centers, self.config.column) if match_cnts else []
         result = (
             (i, j, portals[match_cnts[v][0]]['Latitude'], portals[match_cnts[v][0]]['Longitude'],
              centers[v, 0], centers[v, 1], portals[match_cnts[v][0]]['Name'])
@@ -187,13 +395,65 @@ class Solver:
         )
 
         self._save_match_result(result)
-        self._write_match_image(cv.imread(str(ifs_image_path)), (np.array(cnt[1]) for cnt in match_cnts))
+        self._write_match_image(ifs_image.copy(), (np.array(cnt[1]) for cnt in match_cnts))
+
+    async def split_picture(self, method: str, serve: Tuple[str, int] = None):
+        if self.match_state.method != method:
+            # 匹配进度只对产生它的方法有效，换用其他方法时从头开始
+            if self.match_state.index > 0:
+                self.logger.info(f'已有的匹配进度不是由 {method} 方法得到的，重新匹配')
+            self.match_state.reset()
+            self.match_state.method = method
+        extractor, matcher, ifs_target, ifs_image_path, ifs_image, cells, cell_size = self._prepare_split(method)
+        ifs_digest = self._get_ifs_digest(ifs_image, ifs_target)
+
+        scheduler = None
+        if serve is not None:
+            scheduler = Coordinator(serve, self.config.authkey,
+                                    self._get_distributed_setup(method, extractor, ifs_target, ifs_digest, cell_size),
+                                    ifs_target if isinstance(ifs_target, CellSet) else None,
+                                    **self.config.distributed)
+        elif method == 'silx' and len(self.config.silx_devices) > 1:
+            scheduler = self._create_scheduler(ifs_image_path, ifs_image, cells, ifs_target, ifs_digest, cell_size)
+
+        self.logger.info('计算 Portal 图像')
+        portals = read_portals_from_csv(self.metadata_csv)
+        self.catalog.update_portals(portals)
+
+        match_cnts = self.get_matches(
+            portals,
+            extractor,
+            self._get_matcher_func(extractor, matcher, ifs_target, ifs_digest),
+            self.match_state.index,
+            ifs_target.is_done if isinstance(ifs_target, CellSet) else None,
+            scheduler,
+        )
+        self._save_split_result(portals, match_cnts, ifs_image)
+
+    def regrid(self, column: int = None):
+        if column is not None:
+            self.config.column = column
+        ifs_image = next(iter(self._resident.values()))[4] if self._resident else self._get_ifs_image_crop()[1]
+        portals = read_portals_from_csv(self.metadata_csv)
+        self._save_split_result(portals, self.match_state.match_cnts, ifs_image)
+
+    def invalidate(self, target: str = 'all'):
+        if target in ('ifs', 'all'):
+            self._resident.clear()
+        if target in ('features', 'all') and self.feature_cache is not None:
+            self.feature_cache.clear()
+        if target in ('matches', 'all'):
+            self.match_state.reset()
+            self.catalog.clear_matches()
 
     def draw_passcode(self):
         if not self.config.match_result_csv.exists():
             self.logger.error(f'匹配结果 {str(self.config.match_result_csv)} 不存在，请先使用 --split 识别')
             return
         result = self._read_match_result()
+        if not result:
+            self.logger.error(f'匹配结果 {str(self.config.match_result_csv)} 为空，无法生成 Passcode 图像')
+            return
         result.sort(key=itemgetter('col'))
         cols = groupby(result, key=itemgetter('col'))
         centers = [(int(k) - 1, [(d['lng'], d['lat']) for d in sorted(v, key=itemgetter('row'))]) for k, v in cols]
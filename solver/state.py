@@ -1,7 +1,7 @@
 import hashlib
 import pickle
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
 
@@ -13,20 +13,28 @@ class MatchState:
     def __init__(self, state_path: PathType, metadata_path: PathType, save_progress: bool = True):
         self.state_path = state_path
         self.save_progress = save_progress
-        metadata_digest = self.get_file_hash(metadata_path)
+        metadata_digest = self.get_file_hash(metadata_path) if Path(metadata_path).exists() else ''
         if not self.save_progress:
             Path(self.state_path).unlink(missing_ok=True)
         if Path(self.state_path).exists():
             with open(self.state_path, 'rb') as f:
                 self._state = pickle.load(f)
             if self.metadata_digest == metadata_digest:
+                self._state['match_cnts'] = [(n, cnt) for n, cnt in self.match_cnts if n < self.index]
                 return
+        self.reset(metadata_digest)
+
+    def reset(self, metadata_digest: str = None):
         self._state = {
-            'metadata_digest': '',
+            'metadata_digest': self.metadata_digest if metadata_digest is None else metadata_digest,
             'index': 0,
             'match_cnts': [],
         }
-        self.metadata_digest = metadata_digest
+
+    def refresh(self, metadata_path: PathType):
+        metadata_digest = self.get_file_hash(metadata_path)
+        if self.metadata_digest != metadata_digest:
+            self.reset(metadata_digest)
 
     def __enter__(self):
         return self
@@ -44,9 +52,17 @@ class MatchState:
     def metadata_digest(self, value):
         self._state['metadata_digest'] = value
 
+    @property
+    def method(self) -> Optional[str]:
+        return self._state.get('method')
+
+    @method.setter
+    def method(self, value):
+        self._state['method'] = value
+
     @property
     def index(self) -> int:
-        return self._state.get('index', 0) if self.save_progress else 0
+        return self._state.get('index', 0)
 
     @index.setter
     def index(self, value):
@@ -54,7 +70,7 @@ class MatchState:
 
     @property
     def match_cnts(self) -> List[Tuple[int, np.ndarray]]:
-        return self._state.get('match_cnts', []) if self.save_progress else 0
+        return self._state.setdefault('match_cnts', [])
 
     @staticmethod
     def get_file_hash(file_path: PathType):
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import List
+
+LATENCY_FACTOR = 2.0
+LATENCY_SLACK = 0.1
+DECREASE_FACTOR = 0.5
+SMOOTHING = 0.2
+
+
+class AdaptiveLimiter:
+
+    def __init__(self, min_limit: int, max_limit: int, initial: int = None):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial or self.min_limit, self.min_limit), self.max_limit))
+        self.peak = self.limit
+        self.in_flight = 0
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.nbytes = 0
+        self._baseline = None
+        self._smoothed = None
+        self._cooldown = 0
+        self._cond = asyncio.Condition()
+        self._start = time.perf_counter()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def record(self, latency: float, ok: bool, nbytes: int = 0, congested: bool = True):
+        if not ok and not congested:
+            # 404 等客户端错误与网络拥塞无关，只计数，不参与调整
+            self.errors += 1
+            return
+        if ok:
+            self.latencies.append(latency)
+            self.nbytes += nbytes
+            self._baseline = latency if self._baseline is None else min(self._baseline, latency)
+            self._smoothed = latency if self._smoothed is None else \
+                self._smoothed + SMOOTHING * (latency - self._smoothed)
+            congested = self._smoothed > LATENCY_FACTOR * self._baseline + LATENCY_SLACK
+        else:
+            self.errors += 1
+            congested = True
+        if self._cooldown > 0:
+            self._cooldown -= 1
+        if not congested:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.peak = max(self.peak, self.limit)
+        elif self._cooldown == 0:
+            # 只对降速之后发出的请求重新评估，避免同一批慢请求连续降速
+            self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+            self._cooldown = max(self.in_flight, 1)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self._start
+        latencies = sorted(self.latencies)
+
+        def percentile(q: float) -> float:
+            return latencies[min(int(q * len(latencies)), len(latencies) - 1)] if latencies else 0.0
+
+        return dict(
+            count=len(latencies),
+            errors=self.errors,
+            elapsed=elapsed,
+            rate=len(latencies) / elapsed if elapsed else 0.0,
+            mbps=self.nbytes / 1024 / 1024 / elapsed if elapsed else 0.0,
+            p50=percentile(0.5),
+            p95=percentile(0.95),
+            limit=int(self.limit),
+            peak=int(self.peak),
+        )
@@ -1,10 +1,11 @@
 from pathlib import Path
-from typing import Union, List, Tuple
+from typing import TYPE_CHECKING, Union, List, Tuple
 
-import cv2 as cv
-import numpy as np
+if TYPE_CHECKING:
+    import cv2 as cv
+    import numpy as np
 
 PathType = Union[Path, str]
-KeypointsType = List[Union[cv.KeyPoint, np.recarray]]
-FeaturesType = Union[Tuple[KeypointsType, np.ndarray], np.recarray]
-PackType = np.ndarray
+KeypointsType = List[Union['cv.KeyPoint', 'np.recarray']]
+FeaturesType = Union[Tuple[KeypointsType, 'np.ndarray'], 'np.recarray']
+PackType = 'np.ndarray'
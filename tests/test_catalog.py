@@ -0,0 +1,36 @@
+import sqlite3
+
+from solver.catalog import PortalCatalog
+from solver.utils import parse_portal_filename
+
+
+def test_is_downloaded_trusts_index(tmp_path):
+    with PortalCatalog(tmp_path / 'catalog.db') as catalog:
+        catalog.mark_downloaded('a.jpg', 'hash-a')
+        downloaded = catalog.downloaded_filenames()
+        # 索引中的照片即使文件不存在也不检查，读取失败时再 mark_missing
+        assert catalog.is_downloaded(tmp_path / 'a.jpg', downloaded)
+        catalog.mark_missing('a.jpg')
+        assert catalog.downloaded_filenames() == set()
+        assert catalog.content_hash('a.jpg') is None
+
+
+def test_is_downloaded_registers_existing_file(tmp_path):
+    (tmp_path / 'b.jpg').write_bytes(b'image')
+    with PortalCatalog(tmp_path / 'catalog.db') as catalog:
+        assert not catalog.is_downloaded(tmp_path / 'c.jpg', set())
+        assert catalog.is_downloaded(tmp_path / 'b.jpg', set())
+        assert catalog.downloaded_filenames() == {'b.jpg'}
+        assert catalog.content_hash('b.jpg') == PortalCatalog.get_content_hash(b'image')
+
+
+def test_update_portals_fills_bare_rows(tmp_path):
+    p = {'Name': 'a', 'Latitude': '23.000000', 'Longitude': '113.000000', 'Image': 'http://127.0.0.1/a.jpg'}
+    filename = parse_portal_filename(p['Image'], p['Latitude'], p['Longitude'])
+    with PortalCatalog(tmp_path / 'catalog.db') as catalog:
+        # 下载任务先建立的记录只有文件名，之后写入的元数据需要补全
+        catalog.mark_error(filename, 'timeout')
+        catalog.update_portals([p])
+    with sqlite3.connect(str(tmp_path / 'catalog.db')) as conn:
+        row = conn.execute('SELECT name, lat, lng, image FROM portals WHERE filename = ?', (filename,)).fetchone()
+    assert row == ('a', '23.000000', '113.000000', 'http://127.0.0.1/a.jpg')
@@ -0,0 +1,23 @@
+import numpy as np
+
+from solver.cells import CellSet
+
+
+def make_cells(n: int) -> CellSet:
+    features = [([None] * 4, np.zeros((4, 128), np.float32)) for _ in range(n)]
+    return CellSet([(i * 10, 0, 10, 10) for i in range(n)], [1] * n, features)
+
+
+def test_lone_pending_first_cell_is_not_done():
+    cells = make_cells(2)
+    cells.update_counts([0, 1])
+    assert cells.pending == [0]
+    assert not cells.is_done()
+    cells.update_counts([1, 1])
+    assert cells.is_done()
+
+
+def test_cells_without_enough_features_are_not_pending():
+    cells = CellSet([(0, 0, 10, 10)], [1], [None])
+    assert cells.pending == []
+    assert cells.is_done()
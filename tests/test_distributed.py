@@ -0,0 +1,125 @@
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from multiprocessing.connection import Client
+from pathlib import Path
+
+from solver.distributed import Coordinator, Worker
+
+ROOT = Path(__file__).resolve().parent.parent
+AUTHKEY = b'test-key'
+
+
+def free_address():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()
+
+
+def start_worker(address, handled, delay=0.01):
+    def make_worker(setup):
+        assert setup == {'method': 'fake'}
+
+        def match(job):
+            time.sleep(delay)
+            handled.append(job)
+            return [job * 10]
+
+        return match, None
+
+    worker = Worker(address, AUTHKEY, make_worker)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    return thread
+
+
+def run_coordinator(address, jobs, **kwargs):
+    coordinator = Coordinator(address, AUTHKEY, {'method': 'fake'}, **kwargs)
+    return list(coordinator.map(jobs))
+
+
+def test_workers_share_leases():
+    address = free_address()
+    first, second = [], []
+    threading.Timer(0.2, start_worker, (address, first)).start()
+    threading.Timer(0.2, start_worker, (address, second)).start()
+    results = run_coordinator(address, list(range(16)), lease_size=2)
+    assert sorted(job for job, _ in results) == list(range(16))
+    assert all(result == [job * 10] for job, result in results)
+    assert first and second
+    assert sorted(first + second) == list(range(16))
+
+
+def test_lease_of_disconnected_worker_is_requeued():
+    address = free_address()
+    handled = []
+    taken = []
+
+    def dropping_worker():
+        # 领取租约后只返回一个结果就断开
+        with Client(address, authkey=AUTHKEY) as conn:
+            conn.send(('hello',))
+            conn.recv()
+            conn.send(('lease',))
+            _, lease_id, jobs, _ = conn.recv()
+            taken.extend(job for _, job in jobs)
+            index, job = jobs[0]
+            conn.send(('result', lease_id, index, [job * 10]))
+        start_worker(address, handled)
+
+    threading.Timer(0.2, dropping_worker).start()
+    results = run_coordinator(address, list(range(10)), lease_size=4)
+    counts = Counter(job for job, _ in results)
+    assert sorted(counts) == list(range(10)) and set(counts.values()) == {1}
+    # 断开的 worker 未完成的部分由其他 worker 重新计算
+    assert set(taken[1:]) <= set(handled)
+    assert taken[0] not in handled
+
+
+def test_expired_lease_is_requeued():
+    address = free_address()
+    handled = []
+    hold = threading.Event()
+
+    def stalled_worker():
+        with Client(address, authkey=AUTHKEY) as conn:
+            conn.send(('hello',))
+            conn.recv()
+            conn.send(('lease',))
+            conn.recv()
+            start_worker(address, handled)
+            hold.wait(10)
+
+    threading.Timer(0.2, stalled_worker).start()
+    try:
+        results = run_coordinator(address, list(range(6)), lease_size=3, lease_timeout=0.5)
+    finally:
+        hold.set()
+    assert sorted(job for job, _ in results) == list(range(6))
+    assert sorted(handled) == list(range(6))
+
+
+def test_waiting_worker_exits_cleanly(caplog):
+    address = free_address()
+    # 协调进程在所有结果返回后立即退出
+    script = (f'import sys; sys.path.insert(0, {str(ROOT)!r})\n'
+              'from solver.distributed import Coordinator\n'
+              f'list(Coordinator({address!r}, {AUTHKEY!r}, {{"method": "fake"}}, lease_size=2).map([1, 2]))\n')
+    coordinator = subprocess.Popen([sys.executable, '-c', script])
+    handled = []
+    threads = []
+    # 第二个 worker 连接时租约已全部分配，只能等待；协调进程结束前它应收到 done 正常退出
+    threading.Timer(1.0, lambda: threads.append(start_worker(address, handled, delay=0.5))).start()
+    threading.Timer(1.2, lambda: threads.append(start_worker(address, handled))).start()
+    with caplog.at_level('INFO', logger='solver.distributed'):
+        assert coordinator.wait(20) == 0
+        time.sleep(0.5)
+        for thread in threads:
+            thread.join(5)
+    assert sorted(handled) == [1, 2]
+    assert len(threads) == 2 and not any(thread.is_alive() for thread in threads)
+    assert '连接已断开' not in caplog.text
+    assert caplog.text.count('所有任务已完成') == 2
@@ -0,0 +1,37 @@
+import cv2 as cv
+import numpy as np
+import pytest
+
+from solver.extensions.compress import DescriptorCompressor
+from solver.extensions.sift_opencv import SiftExtractor
+from solver.feature_utils import load_features, save_features
+
+
+def test_save_features_keeps_descriptor_dtype(tmp_path):
+    pack = np.hstack((np.random.default_rng(0).uniform(0, 100, (5, 7)), np.arange(5 * 16).reshape(5, 16)))
+    save_features(tmp_path / 'a.npz', pack, np.uint8)
+    with np.load(tmp_path / 'a.npz') as data:
+        assert data['keypoints'].dtype == np.float32
+        assert data['descriptors'].dtype == np.uint8
+    loaded = load_features(tmp_path / 'a.npz')
+    assert loaded.shape == pack.shape
+    assert np.allclose(loaded, pack, atol=1e-4)
+
+
+@pytest.mark.parametrize('dtype, itemsize', [('float16', 2), ('uint8', 1)])
+def test_compressed_cache_roundtrip(tmp_path, dtype, itemsize):
+    image = cv.resize(np.random.default_rng(1).integers(0, 255, (12, 16), dtype=np.uint8), (320, 240))
+    cv.imwrite(str(tmp_path / 'portal.png'), image)
+    compressor = DescriptorCompressor(dtype=dtype)
+    if compressor.needs_fit:
+        compressor.fit([SiftExtractor().get_array_features(image)[1]])
+    extractor = SiftExtractor(compressor=compressor)
+    assert extractor.cache_suffix == 'npz'
+    cache_path = tmp_path / 'portal.npz'
+    kp, des = extractor.get_features(tmp_path / 'portal.png', cache_path)
+    with np.load(cache_path) as data:
+        assert data['descriptors'].dtype.itemsize == itemsize
+    cached_kp, cached_des = extractor.get_features(tmp_path / 'portal.png', cache_path)
+    assert cached_des.dtype == des.dtype
+    assert np.array_equal(cached_des, des)
+    assert np.allclose([k.pt for k in cached_kp], [k.pt for k in kp], atol=1e-3)
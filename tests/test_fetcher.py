@@ -0,0 +1,44 @@
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+from solver.fetcher import PortalFetcher
+from solver.utils import parse_portal_filename
+
+
+class StubDownloader:
+    """分批返回 portal，下载任务收到即标记为已下载，模拟下载快于地图区块获取的情况"""
+
+    def __init__(self, catalog, portals):
+        self.catalog = catalog
+        self.portals = portals
+
+    async def stream_portals_by_square(self, *args):
+        for i, portal in enumerate(self.portals):
+            if i % 5 == 0:
+                await asyncio.sleep(0.01)
+            yield portal
+
+    async def download_portals_from_queue(self, queue):
+        while (item := await queue.get()) is not None:
+            _, p = item
+            self.catalog.mark_downloaded(parse_portal_filename(p['Image'], p['Latitude'], p['Longitude']), 'hash')
+        return True, None
+
+
+def test_download_all_records_streamed_portals(tmp_path):
+    config = SimpleNamespace(catalog_db=tmp_path / 'catalog.db', metadata_csv=tmp_path / 'metadata.csv',
+                             cookies='', lat=23.0, lng=113.0, radius=1000)
+    fetcher = PortalFetcher(config)
+    portals = [SimpleNamespace(title=f'portal {i}', lat=23 + i / 1000, lng=113.0, image=f'http://127.0.0.1/{i}.jpg')
+               for i in range(20)]
+    fetcher._downloader = StubDownloader(fetcher.catalog, portals)
+    asyncio.run(fetcher.download_all())
+    fetcher.catalog.close()
+
+    with sqlite3.connect(str(config.catalog_db)) as conn:
+        rows = conn.execute('SELECT name, lat, lng, image, downloaded FROM portals').fetchall()
+    assert len(rows) == 20
+    assert all(None not in row for row in rows)
+    assert all(downloaded == 1 for *_, downloaded in rows)
+
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from solver.extensions.base import check_contour, estimate_transform
+
+
+def rect(x, y, w, h):
+    return np.float32([[x, y], [x, y + h - 1], [x + w - 1, y + h - 1], [x + w - 1, y]]).reshape(-1, 1, 2)
+
+
+@pytest.mark.parametrize('model', ['affine', 'similarity', 'scale'])
+def test_reduced_models_require_cell_sized_box(model):
+    src = rect(0, 0, 400, 300)
+    assert check_contour(src, rect(10, 10, 118, 89), model, (120, 90))
+    # 等比缩小的框宽高比不变，只有尺寸检查能排除
+    assert check_contour(src, rect(10, 10, 74, 56), model)
+    assert not check_contour(src, rect(10, 10, 74, 56), model, (120, 90))
+    assert not check_contour(src, rect(10, 10, 74, 56), model, (120, None))
+
+
+def test_scale_model_recovers_transform():
+    rng = np.random.default_rng(0)
+    src = rng.uniform(0, 400, (30, 1, 2)).astype(np.float32)
+    dst = (src * 0.3 + (20, 40)).astype(np.float32)
+    M, mask = estimate_transform(src, dst, 'scale', 10.0)
+    assert M is not None and mask.sum() == 30
+    assert np.allclose(M[:2], [[0.3, 0, 20], [0, 0.3, 40]], atol=1e-3)
@@ -0,0 +1,40 @@
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ('cv2', 'numpy', 'httpx', 'httpx_socks', 'IntelMapClient', 'aiofiles', 'tqdm', 'silx', 'pyopencl')
+
+# 每个阶段实际导入的模块，以及该阶段不应加载的重量级依赖
+STAGES = {
+    'package': (['-c', 'import solver'], HEAVY),
+    'config': (['-c', 'import solver.config'], HEAVY),
+    'cli': (['ifssolver.py', '--help'], HEAVY),
+    'send': (['-c', 'import solver.daemon'], HEAVY),
+    'fetcher': (['-c', 'import solver.fetcher'], HEAVY),
+    'download': (['-c', 'import solver.fetcher, solver.intel_map'], ('cv2', 'numpy', 'silx', 'pyopencl')),
+    'split': (['-c', 'import solver.solver'],
+              ('httpx', 'httpx_socks', 'IntelMapClient', 'aiofiles', 'silx', 'pyopencl')),
+}
+
+
+def import_times(args: list) -> dict:
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
+    times = {}
+    for match in re.finditer(r'^import time:\s+\d+ \|\s+(\d+) \| *(\S+)$', result.stderr, re.MULTILINE):
+        times[match.group(2)] = int(match.group(1))
+    return times
+
+
+@pytest.mark.parametrize('stage', STAGES)
+def test_stage_does_not_load_heavy_modules(stage):
+    args, forbidden = STAGES[stage]
+    times = import_times(args)
+    loaded = sorted({name.split('.')[0] for name in times} & set(forbidden))
+    total = max((us for name, us in times.items() if name.startswith('solver')), default=0) / 1000
+    print(f'{stage}: 导入耗时 {total:.1f} ms')
+    assert not loaded, f'{stage} 阶段不应导入 {", ".join(loaded)}'
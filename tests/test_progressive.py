@@ -0,0 +1,83 @@
+import cv2 as cv
+import numpy as np
+import pytest
+
+from solver.extensions.base import FeatureMatcher
+from solver.extensions.sift_opencv import BFMatcher
+
+
+class FakeMatcher(FeatureMatcher):
+    """features 为整数列表；目标中包含 portal 的全部特征时命中，候选数为两者交集大小"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    def top_features(self, features, n, min_size=0):
+        return features[:n]
+
+    def match_contours(self, src_shape, src_features, dst_features):
+        self.calls.append((len(src_features), len(dst_features)))
+        common = set(src_features) & set(dst_features)
+        return (['hit'] if common and common == set(src_features) else []), len(common)
+
+
+SHAPE = (30, 40, 3)
+PORTAL = list(range(10))
+CELLS = [list(range(100, 110)), list(range(200, 210)), [90, 91, 92, 93] + PORTAL, list(range(300, 310))]
+
+
+def test_budgeted_hit_skips_escalation():
+    matcher = FakeMatcher(budget=3, dst_budget=4)
+    cells = [list(range(100, 110)), [0, 1, 2, 50], list(range(200, 210))]
+    assert matcher.get_cells_match_contours(SHAPE, PORTAL, cells) == [[], ['hit'], []]
+    assert matcher.calls == [(3, 4)] * 3
+
+
+def test_miss_escalates_once_per_portal():
+    matcher = FakeMatcher(budget=3, dst_budget=4, escalate='miss')
+    assert matcher.get_cells_match_contours(SHAPE, PORTAL, CELLS) == [[], [], ['hit'], []]
+    # 首轮覆盖所有单元后只升级一次，而不是每个单元各自重试
+    assert matcher.calls == [(3, 4)] * 4 + [(10, 14 if i == 2 else 10) for i in range(4)]
+
+
+def test_never_does_not_escalate():
+    matcher = FakeMatcher(budget=3, dst_budget=4, escalate='never')
+    assert matcher.get_cells_match_contours(SHAPE, PORTAL, CELLS) == [[], [], [], []]
+    assert len(matcher.calls) == 4
+
+
+@pytest.mark.parametrize('cells, expected', [
+    (CELLS, [[], [], ['hit'], []]),
+    ([list(range(100, 110)), [5, 6, 7, 8, 0, 50, 51, 52]], [[], []]),
+    ([list(range(100, 110)), list(range(200, 210))], [[], []]),
+])
+def test_weak_probe_without_full_pass(cells, expected):
+    matcher = FakeMatcher(budget=3, dst_budget=4, escalate='weak')
+    assert matcher.get_cells_match_contours(SHAPE, PORTAL, cells) == expected
+    assert all(n == 3 for n, _ in matcher.calls)
+
+
+def test_weak_escalates_when_probe_has_candidates():
+    matcher = FakeMatcher(budget=5, dst_budget=4, escalate='weak')
+    cells = [list(range(100, 110)), [100, 101, 102, 103, 0, 1, 2, 3, 9]]
+    assert matcher.get_cells_match_contours(SHAPE, PORTAL, cells) == [[], []]
+    assert matcher.calls == [(5, 4), (5, 4), (5, 10), (5, 9), (10, 10), (10, 9)]
+
+
+def test_single_target():
+    matcher = FakeMatcher()
+    assert matcher.get_match_contours(SHAPE, PORTAL, [99] + PORTAL) == ['hit']
+    assert matcher.calls == [(10, 11)]
+
+
+def test_top_features_prefer_keypoints_visible_in_cell():
+    kp = [cv.KeyPoint(float(i), 0, size, response=response)
+          for i, (size, response) in enumerate([(3, 0.9), (40, 0.1), (30, 0.5), (4, 0.8), (50, 0.3)])]
+    des = np.arange(5, dtype=np.float32).reshape(-1, 1)
+    matcher = BFMatcher(budget=2, cell_size=(100, None))
+    # 400 像素宽的照片缩小到 100 像素，直径小于 8 的关键点在照片单元中已不存在
+    top_kp, top_des = matcher._get_src_top_features((300, 400, 3), (kp, des))
+    assert top_des.ravel().tolist() == [2, 4]
+    top_kp, top_des = BFMatcher(budget=4).top_features((kp, des), 4, min_size=35)
+    assert top_des.ravel().tolist() == [4, 1, 0, 3]
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from solver.extensions.scheduler import DeviceScheduler
+
+DEVICES = [dict(devicetype='GPU', platformid=0, deviceid=i) for i in range(2)]
+
+
+def make_worker_factory(handled, broken=(), delays=None):
+    lock = threading.Lock()
+
+    def make_worker(device):
+        deviceid = device['deviceid']
+        if deviceid in broken and broken[deviceid] is None:
+            raise RuntimeError('设备初始化失败')
+        count = 0
+
+        def match(job):
+            nonlocal count
+            count += 1
+            if deviceid in broken and count > broken[deviceid]:
+                raise RuntimeError('设备运行出错')
+            time.sleep(delays[deviceid] if delays else 0.001)
+            with lock:
+                handled[deviceid].append(job)
+            return job * 10
+
+        return match
+
+    return make_worker
+
+
+def run(scheduler, jobs):
+    results = list(scheduler.map(jobs))
+    assert Counter(job for job, _ in results) == Counter(jobs)
+    assert all(result == job * 10 for job, result in results)
+
+
+def test_fast_device_steals_jobs():
+    handled = {0: [], 1: []}
+    scheduler = DeviceScheduler(DEVICES, make_worker_factory(handled, delays={0: 0.001, 1: 0.05}))
+    run(scheduler, list(range(20)))
+    # 初始每个设备各分到 10 个，快的设备应从慢的设备队列尾部取走一部分
+    assert len(handled[0]) > 10
+    assert sorted(handled[0] + handled[1]) == list(range(20))
+
+
+def test_failed_job_goes_to_fallback():
+    handled = {0: [], 1: [], 'fallback': []}
+
+    def make_fallback():
+        def match(job):
+            handled['fallback'].append(job)
+            return job * 10
+        return match
+
+    # 设备 1 处理 2 张后出错，出错的那张交给 fallback
+    scheduler = DeviceScheduler(DEVICES, make_worker_factory(handled, broken={1: 2}), make_fallback)
+    run(scheduler, list(range(12)))
+    assert len(handled[1]) == 2
+    assert handled['fallback']
+    assert sorted(handled[0] + handled[1] + handled['fallback']) == list(range(12))
+    assert scheduler.stats['fallback'][0] == len(handled['fallback'])
+
+
+def test_fallback_takes_over_when_all_devices_fail():
+    handled = {'fallback': []}
+
+    def make_fallback():
+        def match(job):
+            handled['fallback'].append(job)
+            return job * 10
+        return match
+
+    scheduler = DeviceScheduler(DEVICES, make_worker_factory(handled, broken={0: None, 1: None}), make_fallback)
+    run(scheduler, list(range(6)))
+    assert sorted(handled['fallback']) == list(range(6))
+
+
+def test_failed_device_jobs_requeued_without_fallback():
+    handled = {0: [], 1: []}
+    # 没有 fallback 时，出错设备的任务由剩余设备接手
+    scheduler = DeviceScheduler(DEVICES, make_worker_factory(handled, broken={1: 1}))
+    run(scheduler, list(range(10)))
+    assert len(handled[1]) == 1
+    assert sorted(handled[0] + handled[1]) == list(range(10))
+
+
+def test_all_devices_fail_without_fallback():
+    scheduler = DeviceScheduler(DEVICES, make_worker_factory({}, broken={0: None, 1: None}))
+    with pytest.raises(RuntimeError, match='没有可用的 OpenCL 设备'):
+        list(scheduler.map(list(range(4))))
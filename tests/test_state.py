@@ -0,0 +1,32 @@
+from solver.state import MatchState
+
+
+def test_state_without_metadata_file(tmp_path):
+    state_path = tmp_path / 'match_progress.pkl'
+    with MatchState(state_path, tmp_path / 'missing.csv') as state:
+        assert state.index == 0
+        assert state.metadata_digest == ''
+        state.index = 3
+    assert MatchState(state_path, tmp_path / 'missing.csv').index == 3
+
+
+def test_state_resets_when_metadata_changes(tmp_path):
+    state_path = tmp_path / 'match_progress.pkl'
+    metadata_path = tmp_path / 'metadata.csv'
+    metadata_path.write_text('Name,Latitude,Longitude,Image\n')
+    with MatchState(state_path, metadata_path) as state:
+        state.index = 5
+    metadata_path.write_text('Name,Latitude,Longitude,Image\na,1,2,http://x/a\n')
+    assert MatchState(state_path, metadata_path).index == 0
+
+
+def test_state_records_method(tmp_path):
+    state_path = tmp_path / 'match_progress.pkl'
+    with MatchState(state_path, tmp_path / 'missing.csv') as state:
+        assert state.method is None
+        state.method = 'opencv'
+        state.index = 4
+    state = MatchState(state_path, tmp_path / 'missing.csv')
+    assert (state.method, state.index) == ('opencv', 4)
+    state.reset()
+    assert (state.method, state.index) == (None, 0)